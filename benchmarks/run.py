@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+'''
+Benchmark suite for the desktop app.
+
+Runs offscreen (QT_QPA_PLATFORM=offscreen) against the local stub server
+(weather.stub), so every figure is reproducible without network access or
+an API key. Settings and data live in a temporary directory, never in the
+user's profile. Results are written as JSON; --compare checks them against
+an earlier run and exits with status 1 when a median regressed.
+
+    python benchmarks/run.py --output benchmarks/results/1.1.0.json
+    python benchmarks/run.py --compare benchmarks/results/1.0.0.json
+
+Benchmarks:
+  startup        cold interpreter: imports, window constructed, first paint, first weather shown
+  fetch          get_weather() to the repainted window, through the stub's HTTP
+  parse_display  parse a response, process and display it, repaint
+  suggestions    lookup to suggestions shown, after the debounce: network, cached and refined queries
+  theme          dark_mode/light_mode and set_translucency, each with a repaint
+  memory         bytes per cached city: parsed snapshots in memory and cache rows on disk
+'''
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+BENCHMARKS = ("startup", "fetch", "parse_display", "suggestions", "theme", "memory")
+DEFAULT_CITY = "Omaha, NE"
+
+
+def summarize(samples: list) -> dict:
+    '''
+    :param samples: Durations in seconds.
+    :return: dict of statistics in milliseconds.
+    '''
+    ms = [sample * 1000 for sample in samples]
+    return {
+        "n": len(ms),
+        "min_ms": round(min(ms), 3),
+        "median_ms": round(statistics.median(ms), 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "max_ms": round(max(ms), 3),
+        "stdev_ms": round(statistics.stdev(ms), 3) if len(ms) > 1 else 0.0,
+    }
+
+
+def environment(workdir: str, stub_url: str) -> dict:
+    '''
+    Process environment that isolates the app: offscreen Qt, temporary data and settings, stubbed network.
+    :param workdir: Temporary directory of this run.
+    :param stub_url: Root URL of the stub server.
+    :return: dict to merge into os.environ.
+    '''
+    return {
+        "QT_QPA_PLATFORM": "offscreen",
+        "WEATHER_DATA_DIR": os.path.join(workdir, "data"),
+        "XDG_CONFIG_HOME": os.path.join(workdir, "config"),
+        "WEATHER_API_URL": stub_url + "/data/2.5",
+        "WEATHER_NOMINATIM_URL": stub_url,
+        "WEATHER_OWM_PER_MINUTE": "100000",
+    }
+
+
+def seed_settings() -> None:
+    '''
+    Preset the settings the app would otherwise ask for at first start.
+    '''
+    from PyQt5.QtCore import QSettings
+    settings = QSettings("Prompt", "WeatherApp")
+    settings.setValue("default_city", DEFAULT_CITY)
+    settings.setValue("units", "imperial")
+    settings.setValue("theme", "Dark")
+    settings.sync()
+
+
+def wait_until(app, condition, timeout: float = 10.0) -> None:
+    '''
+    Process events until condition() holds.
+    '''
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("benchmark step did not complete")
+        app.processEvents()
+        time.sleep(0.0005)
+
+
+def settle(app, controller) -> None:
+    '''
+    Let background work (forecast fetches, icon preloads) finish before the next sample.
+    '''
+    controller.threadpool.waitForDone(10000)
+    app.processEvents()
+
+
+# Startup runs in a fresh interpreter per sample, so imports are cold
+
+def startup_child() -> None:
+    '''
+    Entry point of one startup sample; prints its timings as JSON.
+    '''
+    started = time.perf_counter()
+    from PyQt5.QtCore import QEvent, QObject
+    from PyQt5.QtWidgets import QApplication
+    from weather.weather import Controller
+    imported = time.perf_counter()
+
+    seed_settings()
+    app = QApplication([])
+    marks = {}
+
+    class PaintWatcher(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and "first_paint" not in marks:
+                marks["first_paint"] = time.perf_counter()
+            return False
+
+    watcher = PaintWatcher()
+    app.installEventFilter(watcher)
+    controller = Controller()
+    constructed = time.perf_counter()
+    wait_until(app, lambda: "first_paint" in marks)
+    wait_until(app, lambda: controller.showing_weather)
+    controller.repaint()
+    shown = time.perf_counter()
+    print(json.dumps({
+        "import": imported - started,
+        "construct": constructed - started,
+        "first_paint": marks["first_paint"] - started,
+        "weather_shown": shown - started,
+    }))
+    controller.threadpool.waitForDone(10000)
+
+
+def bench_startup(args, env: dict, workdir: str) -> dict:
+    samples = {}
+    for index in range(args.startup_repeat):
+        run_env = dict(os.environ, **env)
+        run_env["WEATHER_DATA_DIR"] = os.path.join(workdir, f"startup-{index}")  # no cache: a cold start
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", "startup"], env=run_env,
+                                check=True, capture_output=True, text=True).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        for name, value in timings.items():
+            samples.setdefault(name, []).append(value)
+    return {name: summarize(values) for name, values in samples.items()}
+
+
+def bench_fetch(args, app, controller) -> dict:
+    samples = []
+    for index in range(args.repeat):
+        city = f"Benchtown {index}"  # a new city each time, so the cache never answers
+        controller.lineEdit.setText(city)
+        started = time.perf_counter()
+        controller.get_weather()
+        wait_until(app, lambda: controller.showing_weather and not controller.loading
+                   and controller.snapshot.query == city)
+        controller.repaint()
+        samples.append(time.perf_counter() - started)
+        settle(app, controller)
+    return {"get_weather": summarize(samples)}
+
+
+def bench_parse_display(args, app, controller) -> dict:
+    from weather.core import WeatherSnapshot
+    from weather.stub import synthesize
+
+    responses = [synthesize("weather", {"q": f"Parsetown {index}", "units": "imperial"})[1]
+                 for index in range(args.repeat)]
+    samples = []
+    for index, response in enumerate(responses):
+        started = time.perf_counter()
+        snapshot = WeatherSnapshot.from_response(response, f"Parsetown {index}", units="imperial")
+        controller.city_name = snapshot.query
+        controller.process_weather(snapshot)
+        controller.display_weather()
+        controller.repaint()
+        samples.append(time.perf_counter() - started)
+    app.processEvents()
+    return {"parse_display": summarize(samples)}
+
+
+def bench_suggestions(args, app, controller) -> dict:
+    from weather.scheduler import RequestScheduler
+
+    # The stub is local; Nominatim's 1 request/second policy would only measure the limiter
+    controller.geocoder.scheduler = RequestScheduler({"nominatim": (1e6, 1000)})
+    controller.gazetteer = None  # always the geocoder path, whether or not an index exists
+
+    def keystroke(text: str) -> float:
+        before = controller.word_list
+        controller.allow_suggestions = True
+        controller.lineEdit.setEnabled(True)
+        # The fixed debounce would dominate every sample, so the lookup is started directly
+        controller.lineEdit.blockSignals(True)
+        controller.lineEdit.setText(text)
+        controller.lineEdit.blockSignals(False)
+        started = time.perf_counter()
+        controller.suggest_city_name()
+        wait_until(app, lambda: controller.word_list is not before)
+        controller.listView.repaint()
+        return time.perf_counter() - started
+
+    queries = [f"Suggestville {index}" for index in range(args.repeat)]
+    network = [keystroke(query) for query in queries]
+    cached = [keystroke(query) for query in queries]
+    refined = [keystroke(query + ", ZZ") for query in queries]
+    controller.allow_suggestions = False
+    return {
+        "debounce_ms": controller.suggestion_timer.interval(),
+        "network": summarize(network),
+        "cached": summarize(cached),
+        "refined": summarize(refined),
+    }
+
+
+def bench_theme(args, app, controller) -> dict:
+    themes, translucency = [], []
+    for index in range(args.repeat):
+        started = time.perf_counter()
+        controller.light_mode() if index % 2 == 0 else controller.dark_mode()
+        controller.repaint()
+        themes.append(time.perf_counter() - started)
+    for index in range(args.repeat):
+        started = time.perf_counter()
+        controller.set_translucency(index % 2 == 1)
+        controller.repaint()
+        translucency.append(time.perf_counter() - started)
+    controller.dark_mode()
+    controller.set_translucency(True)
+    app.processEvents()
+    return {"theme_switch": summarize(themes), "set_translucency": summarize(translucency)}
+
+
+def bench_memory(args, workdir: str) -> dict:
+    from weather.cache import WeatherCache
+    from weather.core import WeatherSnapshot
+    from weather.stub import synthesize
+
+    cities = args.memory_cities
+    responses = [synthesize("weather", {"q": f"Memtown {index}"})[1] for index in range(cities)]
+
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    snapshots = [WeatherSnapshot.from_response(response, f"Memtown {index}")
+                 for index, response in enumerate(responses)]
+    allocated = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(baseline, "filename"))
+    tracemalloc.stop()
+
+    path = os.path.join(workdir, "memory-cache.sqlite3")
+    cache = WeatherCache(path, max_entries=cities)
+    for index, response in enumerate(responses):
+        cache.put(f"Memtown {index}", response)
+    page_size, pages = (cache.db.execute(f"PRAGMA {name}").fetchone()[0] for name in ("page_size", "page_count"))
+    cache.close()
+    return {
+        "cities": cities,
+        "snapshot_bytes_per_city": round(allocated / len(snapshots), 1),
+        "response_json_bytes_per_city": round(sum(len(json.dumps(r)) for r in responses) / cities, 1),
+        "cache_disk_bytes_per_city": round(page_size * pages / cities, 1),
+    }
+
+
+def metadata() -> dict:
+    from PyQt5.QtCore import PYQT_VERSION_STR, QT_VERSION_STR
+    try:
+        revision = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT, capture_output=True,
+                                  text=True).stdout.strip()
+    except OSError:
+        revision = ""
+    return {
+        "timestamp": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "qt": QT_VERSION_STR,
+        "pyqt": PYQT_VERSION_STR,
+    }
+
+
+def medians(results: dict, prefix: str = ""):
+    '''
+    Yield (dotted name, median) for every timing in a results document.
+    '''
+    for name, value in results.items():
+        if isinstance(value, dict):
+            if "median_ms" in value:
+                yield prefix + name, value["median_ms"]
+            else:
+                yield from medians(value, prefix + name + ".")
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    '''
+    :param results: This run's "results".
+    :param baseline: An earlier run's "results".
+    :param threshold: Allowed slowdown ratio, e.g. 1.2 for 20%.
+    :return: List of (name, baseline median, median) that regressed.
+    '''
+    before = dict(medians(baseline))
+    return [(name, before[name], median) for name, median in medians(results)
+            if name in before and before[name] > 0 and median / before[name] > threshold]
+
+
+def measure(args, workdir: str) -> dict:
+    '''
+    Run the selected benchmarks against a stub server.
+    :param args: Parsed command line arguments.
+    :param workdir: Temporary directory for settings, data and fixtures.
+    :return: dict of benchmark name -> result.
+    '''
+    from weather.stub import serve
+    server = serve("127.0.0.1", 0, fixtures_dir=os.path.join(workdir, "fixtures"))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    env = environment(workdir, "http://%s:%d" % server.server_address[:2])
+    os.environ.update(env)
+    selected = args.only or list(BENCHMARKS)
+    results = {}
+
+    if "startup" in selected:
+        results["startup"] = bench_startup(args, env, workdir)
+    if "memory" in selected:
+        results["memory"] = bench_memory(args, workdir)
+
+    in_process = [name for name in ("fetch", "parse_display", "suggestions", "theme") if name in selected]
+    if in_process:
+        from PyQt5.QtWidgets import QApplication
+        from weather.weather import Controller
+        seed_settings()
+        app = QApplication([])
+        controller = Controller()
+        wait_until(app, lambda: controller.showing_weather)
+        settle(app, controller)
+        for name in in_process:
+            results[name] = globals()["bench_" + name](args, app, controller)
+        settle(app, controller)
+        controller.history.flush()
+    server.shutdown()
+    return results
+
+
+def run(args) -> int:
+    workdir = tempfile.mkdtemp(prefix="weather-bench-")
+    try:
+        results = measure(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    document = {"metadata": metadata(), "results": results}
+    text = json.dumps(document, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            regressions = compare(results, json.load(handle)["results"], args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before:.3f} ms -> {after:.3f} ms", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the weather app offscreen against a stub server.")
+    parser.add_argument("--only", action="append", choices=BENCHMARKS, help="run only this benchmark (repeatable)")
+    parser.add_argument("-n", "--repeat", type=int, default=30, help="samples per in-process benchmark (default: 30)")
+    parser.add_argument("--startup-repeat", type=int, default=5, help="cold start samples (default: 5)")
+    parser.add_argument("--memory-cities", type=int, default=1000, help="cities for the memory benchmark")
+    parser.add_argument("-o", "--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="median slowdown ratio reported as a regression (default: 1.2)")
+    parser.add_argument("--child", choices=("startup",), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child == "startup":
+        startup_child()
+        return
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,7 @@ setup(
         "PyQt5>=5.15.0",
         "requests>=2.31.0",
         "geopy>=2.3.0",
+        "numpy>=1.21",
     ],
     license="MIT",
     classifiers=[
@@ -22,11 +23,14 @@ setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    python_requires=">=3.6",
+    python_requires=">=3.10",
     entry_points={
         "gui_scripts": [                 # <- changed from console_scripts
             "weather=weather.main:main",
         ],
+        "console_scripts": [
+            "weather-cli=weather.cli:main",
+        ],
     },
     data_files=[
         ("share/applications", ["assets/weather.desktop"]),
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+'''
+Per-city climatology over the local observation history.
+
+Cities are split into shards that run in separate processes; each process
+opens its own connection to the history database and reduces every city's
+Series with NumPy, so a report over thousands of cities uses every core
+and no Python loop touches individual observations.
+'''
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .history import HistoryStore
+from .units import DEFAULT_UNITS, UNIT_SYSTEMS, convert_fields, convert_temperature
+
+SECONDS_PER_DAY = 86400
+PERCENTILES = (10, 50, 90)
+
+# Degree-day base temperature: 65 F, the usual US convention, in every unit system
+DEGREE_DAY_BASE_KELVIN = (65 - 32) / 1.8 + 273.15
+
+
+def rolling_mean(times: np.ndarray, values: np.ndarray, window: float) -> np.ndarray:
+    '''
+    Mean of the values within the trailing time window ending at each sample.
+    Works with irregular sampling: the window is measured in seconds, not samples.
+    :param times: Sample times, Unix seconds, ascending.
+    :param values: Sample values.
+    :param window: Window length in seconds.
+    :return: Array of the same length as values.
+    '''
+    totals = np.concatenate(([0.0], np.cumsum(values)))
+    starts = np.searchsorted(times, times - window, side="right")
+    ends = np.arange(1, len(values) + 1)
+    return (totals[ends] - totals[starts]) / (ends - starts)
+
+
+def daily_means(times: np.ndarray, values: np.ndarray) -> np.ndarray:
+    '''
+    Mean value of each UTC calendar day that has samples.
+    :param times: Sample times, Unix seconds, ascending.
+    :param values: Sample values.
+    :return: One mean per day.
+    '''
+    days = times // SECONDS_PER_DAY
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    return np.add.reduceat(values, starts) / np.diff(np.r_[starts, len(values)])
+
+
+def measured(values: np.ndarray, reduce):
+    '''
+    Reduce the non-NaN values of a column.
+    :param values: Column that may have gaps (NaN).
+    :param reduce: e.g. np.mean or np.max.
+    :return: float, or None (JSON null) when nothing was measured.
+    '''
+    values = values[~np.isnan(values)]
+    return float(reduce(values)) if values.size else None
+
+
+def summarize(series, units: str = DEFAULT_UNITS, base: float = None, window: float = SECONDS_PER_DAY) -> dict:
+    '''
+    Climatology of one city.
+    :param series: weather.history.Series in standard units, at least one observation.
+    :param units: Unit system of the results.
+    :param base: Degree-day base temperature in units, defaults to 65 F.
+    :param window: Rolling mean window in seconds.
+    :return: dict of statistics.
+    '''
+    series = convert_fields(series, units)
+    if base is None:
+        base = convert_temperature(DEGREE_DAY_BASE_KELVIN, DEFAULT_UNITS, units)
+    temp = series.temp
+    daily = daily_means(series.times, temp)
+    rolling = rolling_mean(series.times, temp, window)
+    percentiles = np.percentile(temp, PERCENTILES)
+    return {
+        "units": units,
+        "count": int(len(temp)),
+        "start": int(series.times[0]),
+        "end": int(series.times[-1]),
+        "days": int(len(daily)),
+        "temp_mean": float(temp.mean()),
+        "temp_min": float(temp.min()),
+        "temp_max": float(temp.max()),
+        **{f"temp_p{p}": float(value) for p, value in zip(PERCENTILES, percentiles)},
+        "rolling_mean_min": float(rolling.min()),
+        "rolling_mean_max": float(rolling.max()),
+        "rolling_mean_last": float(rolling[-1]),
+        "heating_degree_days": float(np.maximum(base - daily, 0).sum()),
+        "cooling_degree_days": float(np.maximum(daily - base, 0).sum()),
+        "humidity_mean": measured(series.humidity, np.mean),
+        "wind_max": measured(series.wind_speed, np.max),
+    }
+
+
+def analyze_shard(path: str, city_ids: list, start: float = None, end: float = None,
+                  units: str = DEFAULT_UNITS, base: float = None) -> list:
+    '''
+    Summarise a group of cities. Runs in a worker process with its own connection.
+    :param path: History database file.
+    :param city_ids: Cities of this shard.
+    :param start: First Unix time included, None for all.
+    :param end: Last Unix time included, None for all.
+    :param units: Unit system of the results.
+    :param base: Degree-day base temperature in units.
+    :return: List of dicts, one per city with data in the range.
+    '''
+    store = HistoryStore(path)
+    try:
+        names = store.names()
+        results = []
+        for city_id in city_ids:
+            series = store.range(city_id, start, end)
+            has_temp = ~np.isnan(series.temp)
+            if not has_temp.any():
+                continue
+            if not has_temp.all():
+                series = type(series)(*(column[has_temp] for column in series))
+            record = {"city_id": city_id, "query": names.get(city_id, "")}
+            record.update(summarize(series, units, base))
+            results.append(record)
+        return results
+    finally:
+        store.close()
+
+
+def analyze(path: str, city_ids: list = None, start: float = None, end: float = None,
+            units: str = DEFAULT_UNITS, base: float = None, workers: int = None, shard_size: int = 50):
+    '''
+    Summarise many cities in parallel, sharded by city across processes.
+    :param path: History database file.
+    :param city_ids: Cities to include, defaults to every city in the history.
+    :param start: First Unix time included, None for all.
+    :param end: Last Unix time included, None for all.
+    :param units: Unit system of the results.
+    :param base: Degree-day base temperature in units, defaults to 65 F.
+    :param workers: Worker processes, defaults to the CPU count.
+    :param shard_size: Cities per task.
+    :return: Generator of per-city dicts, in city order.
+    '''
+    # Checked here, not in the generator, so a bad argument fails at the call
+    if units not in UNIT_SYSTEMS:
+        raise ValueError(f"unknown units {units!r}")
+    return _analyze(path, city_ids, start, end, units, base, workers, shard_size)
+
+
+def _analyze(path: str, city_ids: list, start: float, end: float, units: str, base: float, workers: int,
+             shard_size: int):
+    '''
+    Generator behind analyze(), which has validated the arguments.
+    '''
+    if city_ids is None:
+        store = HistoryStore(path)
+        city_ids = store.cities()
+        store.close()
+    shards = [city_ids[i:i + shard_size] for i in range(0, len(city_ids), shard_size)]
+    if not shards:
+        return
+    workers = min(workers or os.cpu_count() or 1, len(shards))
+    if workers == 1:
+        for shard in shards:
+            yield from analyze_shard(path, shard, start, end, units, base)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(analyze_shard, path, shard, start, end, units, base) for shard in shards]
+        for future in futures:
+            yield from future.result()
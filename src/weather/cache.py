@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import json
+import sqlite3
+import threading
+import time
+
+from .paths import data_path
+
+
+def normalize_key(location: str) -> str:
+    '''
+    Normalise a location query so "omaha,  NE" and "Omaha, NE" share an entry.
+    :param location: Free-text location.
+    :return: The cache key.
+    '''
+    return " ".join(location.lower().replace(",", ", ").split())
+
+
+class WeatherCache:
+    '''
+    SQLite-backed store of decoded OpenWeatherMap responses.
+
+    Entries older than ttl are stale but still returned, so the last known
+    observation can be shown while a fresh one is fetched. Entries older than
+    max_age are deleted, and only the max_entries most recently used are kept.
+    '''
+    def __init__(self, path: str = None, ttl: float = 600, max_entries: int = 500,
+                 max_age: float = 7 * 24 * 3600) -> None:
+        '''
+        :param path: Database file, defaults to weather_cache.sqlite3 in the data directory.
+        :param ttl: Seconds an entry is considered fresh.
+        :param max_entries: Entries kept after eviction.
+        :param max_age: Seconds after which an entry is evicted.
+        :return: None
+        '''
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path or data_path("weather_cache.sqlite3"), check_same_thread=False)
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS weather ("
+                " key TEXT PRIMARY KEY,"
+                " city_id INTEGER,"
+                " response TEXT NOT NULL,"
+                " fetched_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+
+    def get(self, location: str):
+        '''
+        Look up the cached response for a location, fresh or stale.
+        :param location: Location query.
+        :return: (response, fetched_at) or None when nothing is cached.
+        '''
+        key = normalize_key(location)
+        with self._lock:
+            row = self.db.execute("SELECT response, fetched_at FROM weather WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            with self.db:
+                self.db.execute("UPDATE weather SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0]), row[1]
+
+    def get_fresh(self, location: str):
+        '''
+        Look up a cached response that is still within the TTL.
+        :param location: Location query.
+        :return: The response, or None when missing or stale.
+        '''
+        entry = self.get(location)
+        if entry and self.is_fresh(entry[1]):
+            return entry[0]
+        return None
+
+    def is_fresh(self, fetched_at: float) -> bool:
+        '''
+        :param fetched_at: Timestamp the entry was stored.
+        :return: True while the entry is younger than the TTL.
+        '''
+        return time.time() - fetched_at < self.ttl
+
+    def put(self, location: str, response: dict) -> None:
+        '''
+        Store a response and evict old entries.
+        :param location: Location query the response answers.
+        :param response: Decoded OpenWeatherMap response.
+        :return: None
+        '''
+        now = time.time()
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO weather (key, city_id, response, fetched_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (normalize_key(location), response.get("id"), json.dumps(response), now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        '''
+        Drop entries past max_age, then the least recently used beyond max_entries.
+        Caller holds the lock and an open transaction.
+        '''
+        self.db.execute("DELETE FROM weather WHERE fetched_at < ?", (now - self.max_age,))
+        self.db.execute(
+            "DELETE FROM weather WHERE key NOT IN"
+            " (SELECT key FROM weather ORDER BY accessed_at DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+
+    def close(self) -> None:
+        '''
+        Close the database.
+        :param: None
+        :return: None
+        '''
+        with self._lock:
+            self.db.close()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .core import WeatherClient
+from .units import DEFAULT_UNITS, UNIT_SYSTEMS
+
+
+def read_cities(stream):
+    '''
+    Yield city queries from a text stream, one per line.
+    Blank lines and lines starting with # are skipped.
+    :param stream: Open text file.
+    :return: Generator of str.
+    '''
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+def fetch_one(client: WeatherClient, query: str) -> dict:
+    '''
+    Fetch one city and turn the outcome into a JSON-serialisable record.
+    :param client: Client to fetch with.
+    :param query: City query.
+    :return: Snapshot fields, or {"query", "error"} on failure.
+    '''
+    try:
+        return client.current(query).to_dict()
+    except Exception as exc:
+        return {"query": query, "error": str(exc) or exc.__class__.__name__}
+
+
+def run_fetch(args) -> int:
+    '''
+    Fetch many cities concurrently and stream JSON Lines to stdout as they complete.
+    At most 4 * workers requests are queued at once, so input of any length
+    is processed in bounded memory.
+    :param args: Parsed command line arguments.
+    :return: Exit status, 1 if any city failed.
+    '''
+    from .metrics import REGISTRY, configure_log
+    from .scheduler import DEFAULT_LIMITS, RequestScheduler
+    from .transport import Transport
+
+    configure_log(args.metrics_log)
+    cache = None
+    if args.cache:
+        from .cache import WeatherCache
+        cache = WeatherCache(ttl=args.cache_ttl)
+    history = None
+    if args.history:
+        from .history import HistoryStore
+        history = HistoryStore()
+    limits = dict(DEFAULT_LIMITS, owm=(args.per_minute / 60.0, max(1, min(args.per_minute / 6, 100))))
+    transport = Transport(connect_timeout=args.connect_timeout, read_timeout=args.read_timeout,
+                          pool_size=args.workers, scheduler=RequestScheduler(limits))
+    client = WeatherClient(transport=transport, cache=cache, history=history, units=args.units)
+    if not client.api_key and not os.environ.get("WEATHER_API_URL"):  # a weather-cli proxy needs no key
+        print("No API key: set OPENWEATHER_API_KEY, create key/api_key.txt or point WEATHER_API_URL "
+              "at a weather-cli proxy", file=sys.stderr)
+        return 2
+
+    try:
+        # stdin is read but left open
+        source = contextlib.nullcontext(sys.stdin) if args.file == "-" else open(args.file, "r", encoding="utf-8")
+    except OSError as exc:
+        print(f"Cannot read {args.file}: {exc.strerror or exc}", file=sys.stderr)
+        return 2
+    failed = False
+    with source as stream, ThreadPoolExecutor(max_workers=args.workers) as executor:
+        pending = set()
+        for query in read_cities(stream):
+            pending.add(executor.submit(fetch_one, client, query))
+            if len(pending) >= args.workers * 4:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                failed = write_records(done) or failed
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            failed = write_records(done) or failed
+    transport.close()
+    if history is not None:
+        history.close()
+    if args.metrics:
+        REGISTRY.write(args.metrics)
+    return 1 if failed else 0
+
+
+def write_records(futures) -> bool:
+    '''
+    Print finished results as JSON Lines.
+    :param futures: Completed futures from fetch_one.
+    :return: True if any of them is an error record.
+    '''
+    failed = False
+    for future in futures:
+        record = future.result()
+        failed = failed or "error" in record
+        sys.stdout.write(json.dumps(record) + "\n")
+    sys.stdout.flush()
+    return failed
+
+
+def run_proxy(args) -> int:
+    '''
+    Serve cached, coalesced weather JSON over HTTP until interrupted.
+    :param args: Parsed command line arguments.
+    :return: Exit status.
+    '''
+    from .proxy import serve
+
+    server = serve(args.host, args.port, ttl=args.ttl, cache_path=args.cache_file or ":memory:")
+    if not server.RequestHandlerClass.proxy.client.api_key:
+        print("No API key: set OPENWEATHER_API_KEY or create key/api_key.txt", file=sys.stderr)
+        return 2
+    host, port = server.server_address[:2]
+    print(f"Serving weather on http://{host}:{port}/data/2.5/weather", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def run_stub(args) -> int:
+    '''
+    Serve recorded or synthesized OpenWeatherMap and Nominatim responses until interrupted.
+    :param args: Parsed command line arguments.
+    :return: Exit status.
+    '''
+    from .stub import Faults, serve
+
+    faults = Faults(latency=args.latency / 1000, jitter=args.jitter / 1000, error_rate=args.error_rate,
+                    rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after, seed=args.seed)
+    server = serve(args.host, args.port, fixtures_dir=args.fixtures, faults=faults, record=args.record)
+    host, port = server.server_address[:2]
+    stub = server.RequestHandlerClass.stub
+    mode = "recording" if args.record else "replaying"
+    print(f"Stub {mode} {len(stub.fixtures.fixtures)} fixtures; point the app at it with", file=sys.stderr)
+    print(f"  WEATHER_API_URL=http://{host}:{port}/data/2.5 WEATHER_NOMINATIM_URL=http://{host}:{port}",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def parse_time(text: str) -> float:
+    '''
+    Parse a command line time: an ISO date or datetime (UTC unless it has an offset) or Unix seconds.
+    :param text: Argument value.
+    :return: Unix time.
+    '''
+    import datetime as dt
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        moment = dt.datetime.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a date or Unix time: {text}")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=dt.timezone.utc)
+    return moment.timestamp()
+
+
+def positive_int(text: str) -> int:
+    '''
+    Parse a command line count that must be at least 1.
+    :param text: Argument value.
+    :return: int
+    '''
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a whole number: {text}")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1: {text}")
+    return value
+
+
+def positive_float(text: str) -> float:
+    '''
+    Parse a command line rate that must be above 0.
+    :param text: Argument value.
+    :return: float
+    '''
+    try:
+        value = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a number: {text}")
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"must be above 0: {text}")
+    return value
+
+
+def run_analytics(args) -> int:
+    '''
+    Write per-city climatology over the history store as JSON Lines.
+    :param args: Parsed command line arguments.
+    :return: Exit status.
+    '''
+    import time
+    from .analytics import analyze
+    from .paths import data_path
+
+    path = args.history_file or data_path("history.sqlite3")
+    if not os.path.exists(path):
+        print(f"No history at {path}; collect some with weather-cli fetch --history", file=sys.stderr)
+        return 2
+    start = args.start
+    if start is None and args.days:
+        start = (args.end or time.time()) - args.days * 86400
+    cities = args.city or None
+
+    count = 0
+    for record in analyze(path, cities, start, args.end, units=args.units, base=args.base,
+                          workers=args.workers, shard_size=args.shard_size):
+        sys.stdout.write(json.dumps(record) + "\n")
+        count += 1
+    sys.stdout.flush()
+    print(f"{count} cities summarised", file=sys.stderr)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="weather-cli", description="Headless weather tools.")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    fetch = commands.add_parser("fetch", help="fetch current weather for a list of cities as JSON Lines")
+    fetch.add_argument("file", nargs="?", default="-", help="file with one city per line (default: stdin)")
+    fetch.add_argument("-w", "--workers", type=positive_int, default=8, help="concurrent requests (default: 8)")
+    fetch.add_argument("--connect-timeout", type=float, default=3.05)
+    fetch.add_argument("--read-timeout", type=float, default=10.0)
+    fetch.add_argument("--cache", action="store_true", help="use and update the on-disk weather cache")
+    fetch.add_argument("--cache-ttl", type=int, default=600)
+    fetch.add_argument("--per-minute", type=positive_float, default=60,
+                       help="OpenWeatherMap calls allowed per minute (default: 60)")
+    fetch.add_argument("--history", action="store_true", help="append every observation to the history store")
+    fetch.add_argument("--units", choices=sorted(UNIT_SYSTEMS), default=DEFAULT_UNITS,
+                       help="unit system requested from the API (default: standard, Kelvin and m/s)")
+    fetch.add_argument("--metrics", metavar="FILE", help="write latency and cache metrics in Prometheus format")
+    fetch.add_argument("--metrics-log", metavar="FILE", help="log every request and stage as JSON Lines")
+    fetch.set_defaults(handler=run_fetch)
+
+    proxy = commands.add_parser("proxy", help="serve a shared caching proxy for the weather endpoint")
+    proxy.add_argument("--host", default="127.0.0.1")
+    proxy.add_argument("--port", type=int, default=8080)
+    proxy.add_argument("--ttl", type=int, default=600, help="seconds a response is reused (default: 600)")
+    proxy.add_argument("--cache-file", help="SQLite file to keep the cache across restarts")
+    proxy.set_defaults(handler=run_proxy)
+
+    stub = commands.add_parser("stub", help="serve recorded OpenWeatherMap and Nominatim responses for testing")
+    stub.add_argument("--host", default="127.0.0.1")
+    stub.add_argument("--port", type=int, default=8089)
+    stub.add_argument("--fixtures", help="fixture folder (default: fixtures in the data directory)")
+    stub.add_argument("--record", action="store_true",
+                      help="forward requests without a fixture to the real services and save the responses")
+    stub.add_argument("--latency", type=float, default=0.0, help="milliseconds added to every response")
+    stub.add_argument("--jitter", type=float, default=0.0, help="up to this many extra milliseconds")
+    stub.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    stub.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered with 429")
+    stub.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds of injected 429s")
+    stub.add_argument("--seed", type=int, help="random seed for repeatable fault injection")
+    stub.set_defaults(handler=run_stub)
+
+    analytics = commands.add_parser("analytics", help="per-city climatology over the history store as JSON Lines")
+    analytics.add_argument("--history-file", help="history database (default: history.sqlite3 in the data directory)")
+    analytics.add_argument("--start", type=parse_time, help="first time included: ISO date or Unix seconds")
+    analytics.add_argument("--end", type=parse_time, help="last time included: ISO date or Unix seconds")
+    analytics.add_argument("--days", type=float, default=365, help="days before --end when --start is not given "
+                                                                    "(default: 365, 0 for everything)")
+    analytics.add_argument("--city", type=int, action="append", help="city ID to include; repeatable (default: all)")
+    analytics.add_argument("--units", choices=sorted(UNIT_SYSTEMS), default=DEFAULT_UNITS)
+    analytics.add_argument("--base", type=float, help="degree-day base temperature in --units (default: 65 F)")
+    analytics.add_argument("-w", "--workers", type=positive_int, help="worker processes (default: CPU count)")
+    analytics.add_argument("--shard-size", type=positive_int, default=50, help="cities per task (default: 50)")
+    analytics.set_defaults(handler=run_analytics)
+    return parser
+
+
+def main(argv=None) -> None:
+    '''
+    Console entry point. Does not import Qt.
+    :param argv: Arguments, defaults to sys.argv[1:].
+    :return: None
+    '''
+    args = build_parser().parse_args(argv)
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+'''
+Qt-free weather API: fetch OpenWeatherMap data and parse it into snapshots.
+
+Nothing in this module imports PyQt5 or geopy, so it can be used from
+servers, batch jobs and the command line as well as from the GUI.
+'''
+
+import datetime as dt
+import os
+import time
+from typing import NamedTuple
+
+from .metrics import CACHE_LOOKUPS, stage
+from .scheduler import BACKGROUND, INTERACTIVE
+from .units import DEFAULT_UNITS, check_units
+
+OWM_BASE_URL = "https://api.openweathermap.org/data/2.5"
+PROVIDER = "owm"  # scheduler budget charged for every call
+GROUP_SIZE = 20  # most city IDs /group accepts per call
+
+
+class WeatherSnapshot(NamedTuple):
+    '''
+    Immutable current-conditions record parsed from one /weather response.
+    Temperatures and wind speed are in the response's unit system: Kelvin
+    and m/s for "standard", see weather.units.
+    '''
+    query: str
+    city_id: int
+    name: str
+    country: str
+    lat: float
+    lon: float
+    observed_at: int
+    timezone_offset: int
+    condition: str
+    icon: str
+    temp: float
+    feels_like: float
+    temp_min: float
+    temp_max: float
+    humidity: int
+    pressure: int
+    wind_speed: float
+    wind_deg: int
+    sunrise: int
+    sunset: int
+    fetched_at: float
+    units: str = DEFAULT_UNITS
+
+    @classmethod
+    def from_response(cls, response: dict, query: str = "", fetched_at: float = None,
+                      units: str = DEFAULT_UNITS) -> "WeatherSnapshot":
+        '''
+        Parse a decoded /data/2.5/weather response.
+        :param response: The decoded JSON document.
+        :param query: The location query that produced it.
+        :param fetched_at: When it was fetched, defaults to now.
+        :param units: Unit system the response was requested in.
+        :return: WeatherSnapshot
+        '''
+        main, weather = response['main'], response['weather'][0]
+        wind, sys = response.get('wind', {}), response.get('sys', {})
+        return cls(
+            query=query or response.get('name', ''),
+            city_id=response.get('id', 0),
+            name=response.get('name', query),
+            country=sys.get('country', ''),
+            lat=response['coord']['lat'],
+            lon=response['coord']['lon'],
+            observed_at=response.get('dt', 0),
+            timezone_offset=response.get('timezone', sys.get('timezone', 0)),
+            condition=weather['description'],
+            icon=weather['icon'],
+            temp=main['temp'],
+            feels_like=main['feels_like'],
+            temp_min=main['temp_min'],
+            temp_max=main['temp_max'],
+            humidity=main['humidity'],
+            pressure=main.get('pressure', 0),
+            wind_speed=wind.get('speed', 0.0),
+            wind_deg=wind.get('deg', 0),
+            sunrise=sys.get('sunrise', 0),
+            sunset=sys.get('sunset', 0),
+            fetched_at=time.time() if fetched_at is None else fetched_at,
+            units=units,
+        )
+
+    @property
+    def timezone(self) -> dt.timezone:
+        return dt.timezone(dt.timedelta(seconds=self.timezone_offset))
+
+    def local_time(self, timestamp: float = None) -> dt.datetime:
+        '''
+        Convert a Unix timestamp (default: now) to the location's local time.
+        :param timestamp: Seconds since the epoch.
+        :return: Timezone-aware datetime.
+        '''
+        if timestamp is None:
+            return dt.datetime.now(dt.timezone.utc).astimezone(self.timezone)
+        return dt.datetime.fromtimestamp(timestamp, tz=self.timezone)
+
+    def to_dict(self) -> dict:
+        '''
+        Plain dict of all fields, suitable for json.dumps.
+        '''
+        return dict(self._asdict())
+
+
+def load_api_key() -> str:
+    '''
+    Read the OpenWeatherMap API key.
+    OPENWEATHER_API_KEY takes precedence over key/api_key.txt in the project root.
+    :param: None
+    :return: The key, or an empty string when none is configured.
+    '''
+    key = os.environ.get("OPENWEATHER_API_KEY", "").strip()
+    if key:
+        return key
+
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    try:
+        with open(os.path.join(project_root, "key", "api_key.txt"), 'r') as file:
+            return file.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+class WeatherClient:
+    '''
+    Fetch current conditions as WeatherSnapshot objects.
+
+    A WeatherCache, when given, answers queries within its TTL and stores
+    every fresh response. A HistoryStore, when given, logs every observation
+    received from the network. The HTTP transport is created on first use.
+    '''
+    def __init__(self, api_key: str = None, transport=None, cache=None, base_url: str = None,
+                 history=None, units: str = DEFAULT_UNITS) -> None:
+        '''
+        :param api_key: OpenWeatherMap key, defaults to load_api_key().
+        :param transport: weather.transport.Transport to send requests through.
+        :param cache: Optional weather.cache.WeatherCache.
+        :param base_url: API root, defaults to $WEATHER_API_URL, then OWM_BASE_URL.
+            Point it at a weather-cli proxy (http://host:port/data/2.5) to share its cache.
+        :param history: Optional weather.history.HistoryStore.
+        :param units: Unit system requested from the API ("standard", "metric" or "imperial").
+        :return: None
+        '''
+        self.api_key = load_api_key() if api_key is None else api_key
+        self._transport = transport
+        self.cache = cache
+        self.history = history
+        self.units = check_units(units)
+        self.base_url = (base_url or os.environ.get("WEATHER_API_URL") or OWM_BASE_URL).rstrip("/")
+        self.background_timeout = 30.0  # background requests give up (QuotaExceeded) after this wait
+
+    @property
+    def transport(self):
+        if self._transport is None:
+            from .transport import Transport
+            self._transport = Transport()
+        return self._transport
+
+    def cache_key(self, query: str, units: str = None) -> str:
+        '''
+        Cache key of a location's current conditions. Responses in other unit
+        systems are cached separately; "standard" uses the bare query.
+        :param query: Location, e.g. "Omaha, NE".
+        :param units: Unit system, defaults to self.units.
+        :return: str
+        '''
+        units = units or self.units
+        return query if units == DEFAULT_UNITS else f"{units}:{query}"
+
+    def params(self, units: str = None, **params) -> dict:
+        '''
+        Query parameters for an API call: the key, units= unless "standard", and params.
+        '''
+        units = units or self.units
+        if units != DEFAULT_UNITS:
+            params['units'] = units
+        params['appid'] = self.api_key
+        return params
+
+    def current_response(self, query: str, priority: int = INTERACTIVE, refresh: bool = False,
+                         units: str = None) -> dict:
+        '''
+        Raw /weather response for a location, from the cache when fresh.
+        Raises weather.transport.TransportError when the request fails and
+        weather.scheduler.QuotaExceeded when a background request gets no budget.
+        :param query: Location, e.g. "Omaha, NE".
+        :param priority: INTERACTIVE, or BACKGROUND for refreshes nobody is waiting for.
+        :param refresh: Skip the cache lookup, e.g. when a newer observation is due.
+        :param units: Unit system to request, defaults to self.units.
+        :return: The decoded JSON document.
+        '''
+        units = check_units(units or self.units)
+        key = self.cache_key(query, units)
+        if self.cache is not None and not refresh:
+            cached = self.cache.get_fresh(key)
+            CACHE_LOOKUPS.inc(cache="weather", result="miss" if cached is None else "hit")
+            if cached is not None:
+                return cached
+
+        response = self.transport.get_json(f"{self.base_url}/weather", params=self.params(units, q=query),
+                                           provider=PROVIDER, priority=priority,
+                                           budget_timeout=self.background_timeout if priority == BACKGROUND else None)
+        if self.cache is not None:
+            self.cache.put(key, response)
+        if self.history is not None:
+            self.history.record_response(query, response, units)
+        return response
+
+    def current(self, query: str, priority: int = INTERACTIVE, refresh: bool = False) -> WeatherSnapshot:
+        '''
+        Current conditions for a location, in self.units.
+        :param query: Location, e.g. "Omaha, NE".
+        :param priority: INTERACTIVE or BACKGROUND.
+        :param refresh: Skip the cache lookup.
+        :return: WeatherSnapshot
+        '''
+        units = self.units
+        response = self.current_response(query, priority, refresh, units)
+        with stage("parse"):
+            return WeatherSnapshot.from_response(response, query, units=units)
+
+    def forecast_response(self, query: str, priority: int = INTERACTIVE, refresh: bool = False,
+                          units: str = None) -> dict:
+        '''
+        Raw /forecast response (5 days in 3-hour steps), from the cache when fresh.
+        Cached under "forecast:<query>" next to the current conditions.
+        :param query: Location, e.g. "Omaha, NE".
+        :param priority: INTERACTIVE or BACKGROUND.
+        :param refresh: Skip the cache lookup.
+        :param units: Unit system to request, defaults to self.units.
+        :return: The decoded JSON document.
+        '''
+        units = check_units(units or self.units)
+        key = "forecast:" + self.cache_key(query, units)
+        if self.cache is not None and not refresh:
+            cached = self.cache.get_fresh(key)
+            CACHE_LOOKUPS.inc(cache="forecast", result="miss" if cached is None else "hit")
+            if cached is not None:
+                return cached
+
+        response = self.transport.get_json(f"{self.base_url}/forecast", params=self.params(units, q=query),
+                                           provider=PROVIDER, priority=priority,
+                                           budget_timeout=self.background_timeout if priority == BACKGROUND else None)
+        if self.cache is not None:
+            self.cache.put(key, response)
+        return response
+
+    def forecast(self, query: str, priority: int = INTERACTIVE, refresh: bool = False):
+        '''
+        Forecast for a location as NumPy arrays.
+        :param query: Location, e.g. "Omaha, NE".
+        :param priority: INTERACTIVE or BACKGROUND.
+        :param refresh: Skip the cache lookup.
+        :return: weather.forecast.Forecast, in self.units.
+        '''
+        from .forecast import Forecast
+        units = self.units
+        response = self.forecast_response(query, priority, refresh, units)
+        with stage("forecast_parse"):
+            return Forecast.from_response(response, query, units=units)
+
+    def group_responses(self, city_ids: list, priority: int = INTERACTIVE, units: str = None) -> list:
+        '''
+        Raw responses for many cities, using one /group call per GROUP_SIZE IDs.
+        :param city_ids: OpenWeatherMap city IDs.
+        :param priority: INTERACTIVE or BACKGROUND.
+        :param units: Unit system to request, defaults to self.units.
+        :return: List of decoded responses, in the order the API returns them.
+        '''
+        units = check_units(units or self.units)
+        responses = []
+        for start in range(0, len(city_ids), GROUP_SIZE):
+            chunk = city_ids[start:start + GROUP_SIZE]
+            params = self.params(units, id=",".join(str(city_id) for city_id in chunk))
+            response = self.transport.get_json(f"{self.base_url}/group", params=params, provider=PROVIDER,
+                                               priority=priority,
+                                               budget_timeout=self.background_timeout if priority == BACKGROUND else None)
+            responses.extend(response.get('list', []))
+        if self.history is not None:
+            for response in responses:
+                self.history.record_response("", response, units)
+        return responses
+
+    def group(self, city_ids: list, priority: int = INTERACTIVE) -> dict:
+        '''
+        Current conditions for many cities, batched through the /group endpoint.
+        :param city_ids: OpenWeatherMap city IDs.
+        :param priority: INTERACTIVE or BACKGROUND.
+        :return: dict of city ID -> WeatherSnapshot, in self.units.
+        '''
+        units = self.units
+        return {response['id']: WeatherSnapshot.from_response(response, units=units)
+                for response in self.group_responses(city_ids, priority, units)}
+
+    def cached(self, query: str):
+        '''
+        Last cached conditions for a location, however old, without network access.
+        :param query: Location, e.g. "Omaha, NE".
+        :return: WeatherSnapshot, or None when nothing is cached.
+        '''
+        if self.cache is None:
+            return None
+        entry = self.cache.get(self.cache_key(query))
+        if entry is None:
+            return None
+        return WeatherSnapshot.from_response(entry[0], query, fetched_at=entry[1], units=self.units)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+
+from collections import OrderedDict
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, QRect, QSize, Qt, QThreadPool, QTimer, pyqtSignal
+from PyQt5.QtGui import QPalette
+from PyQt5.QtWidgets import QListView, QStyle, QStyledItemDelegate, QVBoxLayout, QWidget
+
+from .units import convert_snapshot, format_temperature
+from .watchlist import Watchlist
+from .workers import Worker
+
+SNAPSHOT_ROLE = Qt.UserRole + 1
+FAILED_ROLE = Qt.UserRole + 2
+ROW_HEIGHT = 40
+
+
+class DashboardModel(QAbstractListModel):
+    '''
+    Lazy list model over watchlist entries.
+
+    Rows start empty. fetch_rows() is called with the range the view shows
+    and fetches only the entries in it that have no snapshot yet, cache
+    first and then through batched /group calls on a worker thread. At most
+    max_snapshots snapshots are kept (least recently shown dropped first),
+    so memory and requests follow the viewport rather than the list length.
+    '''
+    # Entries that gained a city ID, so the owner can persist them
+    entries_resolved = pyqtSignal(list)
+
+    def __init__(self, entries: list, client, threadpool: QThreadPool = None, max_snapshots: int = 256,
+                 parent=None) -> None:
+        '''
+        :param entries: WatchEntry objects, one row each.
+        :param client: WeatherClient used for fetching.
+        :param threadpool: Pool for fetch workers, defaults to the global one.
+        :param max_snapshots: Snapshots kept in memory.
+        :param parent: Owning QObject.
+        :return: None
+        '''
+        super().__init__(parent)
+        self.entries = list(entries)
+        self.client = client
+        self.threadpool = threadpool or QThreadPool.globalInstance()
+        self.max_snapshots = max_snapshots
+        self.snapshots = OrderedDict()  # query -> WeatherSnapshot
+        self.pending = set()
+        self.failed = set()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.entries)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self.entries):
+            return None
+        query = self.entries[index.row()].query
+        if role in (Qt.DisplayRole, Qt.UserRole):
+            return query
+        if role == SNAPSHOT_ROLE:
+            return self.snapshots.get(query)
+        if role == FAILED_ROLE:
+            return query in self.failed
+        return None
+
+    def fetch_rows(self, first: int, last: int) -> None:
+        '''
+        Start fetching the rows in a range that have no data and are not in flight.
+        :param first: First row, inclusive.
+        :param last: Last row, inclusive.
+        :return: None
+        '''
+        wanted = []
+        for entry in self.entries[max(0, first):last + 1]:
+            if entry.query in self.snapshots:
+                self.snapshots.move_to_end(entry.query)
+            elif entry.query not in self.pending and entry.query not in self.failed:
+                wanted.append(entry)
+        if not wanted:
+            return
+
+        self.pending.update(entry.query for entry in wanted)
+        worker = Worker(self.fetch_entries, wanted)
+        worker.signals.finished.connect(self.on_rows_fetched)
+        worker.signals.error.connect(lambda message, wanted=wanted: self.on_rows_failed(wanted))
+        self.threadpool.start(worker)
+
+    def fetch_entries(self, entries: list) -> tuple:
+        '''
+        Resolve and fetch a batch of entries. Runs on a worker thread.
+        :param entries: WatchEntry objects.
+        :return: (entries with city IDs, dict of query -> WeatherSnapshot, unresolved queries)
+        '''
+        batch = Watchlist(entries)
+        failed = batch.resolve(self.client)
+        return batch.entries, batch.refresh(self.client, use_cache=True), failed
+
+    def on_rows_fetched(self, result: tuple) -> None:
+        '''
+        Store fetched snapshots and repaint their rows.
+        :param result: Return value of fetch_entries.
+        :return: None
+        '''
+        entries, snapshots, failed = result
+        resolved = []
+        positions = {entry.query: row for row, entry in enumerate(self.entries)}
+        for entry in entries:
+            self.pending.discard(entry.query)
+            row = positions.get(entry.query)
+            if row is None:
+                continue
+            if entry.city_id and not self.entries[row].city_id:
+                self.entries[row] = entry
+                resolved.append(entry)
+            snapshot = snapshots.get(entry.query)
+            if snapshot is not None:
+                self.snapshots[entry.query] = snapshot
+                self.snapshots.move_to_end(entry.query)
+            else:
+                self.failed.add(entry.query)  # Not retried while the dashboard is open
+            self.dataChanged.emit(self.index(row), self.index(row), [SNAPSHOT_ROLE])
+        self.failed.update(failed)
+
+        while len(self.snapshots) > self.max_snapshots:
+            self.snapshots.popitem(last=False)
+        if resolved:
+            self.entries_resolved.emit(resolved)
+
+    def set_units(self, units: str) -> None:
+        '''
+        Convert the loaded snapshots to another unit system and repaint.
+        :param units: Unit system name.
+        :return: None
+        '''
+        for query, snapshot in self.snapshots.items():
+            self.snapshots[query] = convert_snapshot(snapshot, units)
+        if self.entries:
+            self.dataChanged.emit(self.index(0), self.index(len(self.entries) - 1), [SNAPSHOT_ROLE])
+
+    def on_rows_failed(self, entries: list) -> None:
+        '''
+        Allow a failed batch to be requested again.
+        :param entries: The entries of the failed batch.
+        :return: None
+        '''
+        for entry in entries:
+            self.pending.discard(entry.query)
+
+
+class DashboardDelegate(QStyledItemDelegate):
+    '''
+    Paints one fixed-height row: icon, city, temperature and condition.
+    Nothing is laid out per row, and icons come pre-scaled from the IconStore.
+    '''
+    def __init__(self, icons, parent=None) -> None:
+        '''
+        :param icons: weather.icons.IconStore.
+        :param parent: Owning QObject.
+        :return: None
+        '''
+        super().__init__(parent)
+        self.icons = icons
+
+    def sizeHint(self, option, index) -> QSize:
+        return QSize(option.rect.width(), ROW_HEIGHT)
+
+    def paint(self, painter, option, index) -> None:
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+        rect = option.rect
+        icon_size = QSize(rect.height(), rect.height())
+        snapshot = index.data(SNAPSHOT_ROLE)
+
+        painter.save()
+        painter.setPen(option.palette.color(QPalette.Text))
+        text_rect = QRect(rect.left() + icon_size.width() + 6, rect.top(), rect.width() - icon_size.width() - 12,
+                          rect.height())
+        painter.drawText(text_rect, Qt.AlignVCenter | Qt.AlignLeft, index.data())
+        if snapshot is None:
+            status = "unavailable" if index.data(FAILED_ROLE) else "Loading..."
+            painter.drawText(text_rect, Qt.AlignVCenter | Qt.AlignRight, status)
+        else:
+            pixmap = self.icons.pixmap(snapshot.icon, icon_size, painter.device().devicePixelRatioF())
+            painter.drawPixmap(rect.left(), rect.top(), pixmap)
+            painter.drawText(text_rect, Qt.AlignVCenter | Qt.AlignRight,
+                             f"{format_temperature(snapshot.temp, snapshot.units)}  {snapshot.condition}")
+        painter.restore()
+
+
+class DashboardWindow(QWidget):
+    '''
+    Scrollable board of watched cities. Rows are fetched as they scroll into view.
+    '''
+    # Query of a double-clicked row
+    city_selected = pyqtSignal(str)
+
+    def __init__(self, model: DashboardModel, icons, prefetch: int = 5, parent=None) -> None:
+        '''
+        :param model: The DashboardModel to show.
+        :param icons: weather.icons.IconStore for the delegate.
+        :param prefetch: Rows past the bottom of the viewport to fetch ahead.
+        :param parent: Parent widget.
+        :return: None
+        '''
+        super().__init__(parent, Qt.Window)
+        self.setWindowTitle("Weather Dashboard")
+        self.resize(420, 600)
+        self.model = model
+        self.prefetch = prefetch
+
+        self.view = QListView(self)
+        self.view.setObjectName("dashboardView")
+        self.view.setUniformItemSizes(True)  # Row geometry is computed once, not per row
+        self.view.setItemDelegate(DashboardDelegate(icons, self.view))
+        self.view.setModel(model)
+        self.view.setSelectionMode(QListView.SingleSelection)
+        self.view.doubleClicked.connect(lambda index: self.city_selected.emit(index.data(Qt.UserRole)))
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.view)
+
+        # Scrolling fires many events; fetch once it settles
+        self.fetch_timer = QTimer(self)
+        self.fetch_timer.setSingleShot(True)
+        self.fetch_timer.timeout.connect(self.fetch_visible)
+        self.view.verticalScrollBar().valueChanged.connect(lambda value: self.fetch_timer.start(100))
+
+    def visible_rows(self) -> tuple:
+        '''
+        :return: (first, last) rows currently in the viewport.
+        '''
+        viewport = self.view.viewport().rect()
+        first = self.view.indexAt(viewport.topLeft())
+        last = self.view.indexAt(viewport.bottomLeft())
+        first_row = first.row() if first.isValid() else 0
+        last_row = last.row() if last.isValid() else self.model.rowCount() - 1
+        return first_row, last_row
+
+    def fetch_visible(self) -> None:
+        '''
+        Fetch the rows in view plus a few below.
+        :param: None
+        :return: None
+        '''
+        first, last = self.visible_rows()
+        self.model.fetch_rows(first, last + self.prefetch)
+
+    def showEvent(self, event) -> None:
+        super().showEvent(event)
+        self.fetch_timer.start(0)
+
+    def resizeEvent(self, event) -> None:
+        super().resizeEvent(event)
+        self.fetch_timer.start(100)
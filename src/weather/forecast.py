@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+'''
+5-day / 3-hour forecasts as NumPy arrays.
+
+A /data/2.5/forecast response holds up to 40 steps. They are unpacked once
+into one array per field; daily aggregates, unit conversion and trends are
+then whole-array operations, so processing many cities does not run Python
+code per step and per field. Like core, this module does not import PyQt5.
+'''
+
+import datetime as dt
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from .units import DEFAULT_UNITS, UNIT_SYSTEMS, convert_temperature
+
+SECONDS_PER_DAY = 86400
+FORECAST_INTERVAL = 3 * 3600  # the provider publishes a new forecast run every 3 hours
+
+
+class DailySummary(NamedTuple):
+    '''
+    Per-day aggregates of a forecast, one array element per local calendar day.
+    Values are in the forecast's unit system.
+    '''
+    days: np.ndarray        # local midnight of each day, Unix seconds
+    temp_min: np.ndarray
+    temp_max: np.ndarray
+    temp_mean: np.ndarray
+    humidity_mean: np.ndarray
+    wind_max: np.ndarray
+    pop_max: np.ndarray     # highest probability of precipitation, 0..1
+    icons: list             # icon of the step nearest local noon
+    conditions: list
+
+
+class Forecast:
+    '''
+    Parsed forecast for one location: one array per field, one element per step.
+    '''
+    def __init__(self, query: str, city_id: int, name: str, timezone_offset: int, times, temp, feels_like,
+                 humidity, wind_speed, pop, icons, conditions, fetched_at: float = None,
+                 units: str = DEFAULT_UNITS) -> None:
+        '''
+        :param query: Location query that produced the forecast.
+        :param city_id: OpenWeatherMap city ID.
+        :param name: City name.
+        :param timezone_offset: Seconds east of UTC.
+        :param times: Step times, Unix seconds, ascending.
+        :param temp: Temperatures.
+        :param feels_like: Apparent temperatures.
+        :param humidity: Relative humidity in percent.
+        :param wind_speed: Wind speed.
+        :param pop: Probability of precipitation, 0..1.
+        :param icons: Icon code of each step.
+        :param conditions: Condition description of each step.
+        :param fetched_at: When the response was fetched, defaults to now.
+        :param units: Unit system of temp, feels_like and wind_speed (see weather.units).
+        :return: None
+        '''
+        self.query = query
+        self.city_id = city_id
+        self.name = name
+        self.timezone_offset = timezone_offset
+        self.times = np.asarray(times, dtype=np.int64)
+        self.temp = np.asarray(temp, dtype=np.float64)
+        self.feels_like = np.asarray(feels_like, dtype=np.float64)
+        self.humidity = np.asarray(humidity, dtype=np.float64)
+        self.wind_speed = np.asarray(wind_speed, dtype=np.float64)
+        self.pop = np.asarray(pop, dtype=np.float64)
+        self.icons = list(icons)
+        self.conditions = list(conditions)
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+        self.units = units
+
+    @classmethod
+    def from_response(cls, response: dict, query: str = "", fetched_at: float = None,
+                      units: str = DEFAULT_UNITS) -> "Forecast":
+        '''
+        Parse a decoded /data/2.5/forecast response.
+        :param response: The decoded JSON document.
+        :param query: The location query that produced it.
+        :param fetched_at: When it was fetched, defaults to now.
+        :param units: Unit system the response was requested in.
+        :return: Forecast
+        '''
+        steps = response.get('list', [])
+        city = response.get('city', {})
+        columns = np.array([
+            (step['dt'], step['main']['temp'], step['main']['feels_like'], step['main']['humidity'],
+             step.get('wind', {}).get('speed', 0.0), step.get('pop', 0.0))
+            for step in steps
+        ], dtype=np.float64).reshape(-1, 6)
+        weather = [step['weather'][0] for step in steps]
+        return cls(
+            query=query or city.get('name', ''),
+            city_id=city.get('id', 0),
+            name=city.get('name', query),
+            timezone_offset=city.get('timezone', 0),
+            times=columns[:, 0],
+            temp=columns[:, 1],
+            feels_like=columns[:, 2],
+            humidity=columns[:, 3],
+            wind_speed=columns[:, 4],
+            pop=columns[:, 5],
+            icons=[item['icon'] for item in weather],
+            conditions=[item['description'] for item in weather],
+            fetched_at=fetched_at,
+            units=units,
+        )
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def is_stale(self, now: float = None) -> bool:
+        '''
+        True once the provider has published a newer forecast run.
+        :param now: Current Unix time, defaults to now.
+        :return: bool
+        '''
+        return (time.time() if now is None else now) - self.fetched_at >= FORECAST_INTERVAL
+
+    def local_days(self) -> np.ndarray:
+        '''
+        Local midnight of the day each step falls on, Unix seconds.
+        '''
+        local = self.times + self.timezone_offset
+        return local - local % SECONDS_PER_DAY - self.timezone_offset
+
+    def daily(self) -> DailySummary:
+        '''
+        Aggregate the steps by local calendar day.
+        :param: None
+        :return: DailySummary
+        '''
+        days = self.local_days()
+        if not len(days):
+            empty = np.array([], dtype=np.float64)
+            return DailySummary(days, empty, empty, empty, empty, empty, empty, [], [])
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        counts = np.diff(np.r_[starts, len(days)])
+
+        # Step nearest local noon represents the day's condition
+        from_noon = np.abs((self.times + self.timezone_offset) % SECONDS_PER_DAY - SECONDS_PER_DAY // 2)
+        order = np.lexsort((from_noon, days))
+        ordered = days[order]
+        first_of_day = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+        noon = order[first_of_day]
+
+        return DailySummary(
+            days=days[starts],
+            temp_min=np.minimum.reduceat(self.temp, starts),
+            temp_max=np.maximum.reduceat(self.temp, starts),
+            temp_mean=np.add.reduceat(self.temp, starts) / counts,
+            humidity_mean=np.add.reduceat(self.humidity, starts) / counts,
+            wind_max=np.maximum.reduceat(self.wind_speed, starts),
+            pop_max=np.maximum.reduceat(self.pop, starts),
+            icons=[self.icons[i] for i in noon],
+            conditions=[self.conditions[i] for i in noon],
+        )
+
+    def trend(self) -> float:
+        '''
+        Least-squares slope of the temperature over the forecast.
+        :param: None
+        :return: Degrees per day in the forecast's units; positive when warming, 0.0 with fewer than two steps.
+        '''
+        if len(self.times) < 2:
+            return 0.0
+        days = (self.times - self.times[0]) / SECONDS_PER_DAY
+        return float(np.polyfit(days, self.temp, 1)[0])
+
+    def trend_summary(self, units: str = None) -> str:
+        '''
+        The trend in words.
+        :param units: Unit system to report in, defaults to the forecast's.
+        :return: str
+        '''
+        units = units or self.units
+        # A difference of temperatures scales like the temperatures, without the offset
+        per_day = convert_temperature(self.trend(), self.units, units) - convert_temperature(0.0, self.units, units)
+        if abs(per_day) < 0.5:
+            return "Steady temperatures"
+        return f"{'Warming' if per_day > 0 else 'Cooling'} {abs(per_day):.1f} {UNIT_SYSTEMS[units].temperature}/day"
+
+    def summary_lines(self, units: str = None) -> list:
+        '''
+        One display line per day, followed by the trend.
+        :param units: Unit system to show, defaults to the forecast's.
+        :return: list of str
+        '''
+        units = units or self.units
+        daily = self.daily()
+        extremes = np.rint(convert_temperature(np.vstack([daily.temp_min, daily.temp_max]), self.units, units))
+        low, high = extremes.astype(int)
+        label = UNIT_SYSTEMS[units].temperature
+        pop = np.rint(daily.pop_max * 100).astype(int)
+        tz = dt.timezone(dt.timedelta(seconds=self.timezone_offset))
+        lines = [
+            f"{dt.datetime.fromtimestamp(day, tz=tz):%a %d}: {lo}-{hi} {label}, {chance}% precip, {condition}"
+            for day, lo, hi, chance, condition in zip(daily.days.tolist(), low, high, pop, daily.conditions)
+        ]
+        lines.append(self.trend_summary(units))
+        return lines
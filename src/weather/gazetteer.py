@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+
+import argparse
+import functools
+import gzip
+import heapq
+import json
+import mmap
+import os
+import struct
+import threading
+import unicodedata
+from typing import NamedTuple
+
+from .paths import data_path
+
+MAGIC = b"WGAZ"
+VERSION = 2
+HEADER = struct.Struct("<4sIIII")       # magic, version, records, top entries, strings offset
+RECORD = struct.Struct("<IHIHIIff")     # key off/len, label off/len, city id, population, lat, lon
+TOP_PREFIX = 3                          # prefixes up to this length get a precomputed ranking
+TOP_SIZE = 10
+TOP = struct.Struct("<%dsB%dI" % (4 * TOP_PREFIX, TOP_SIZE))  # UTF-8 prefix, its length in bytes, ranking
+EMPTY = 0xFFFFFFFF
+SCAN_LIMIT = 2048                       # records ranked at most per prefix range
+ALPHABET = "abcdefghijklmnopqrstuvwxyz "
+# Latin letters that do not decompose into an ASCII letter plus accents
+LATIN_FOLDS = str.maketrans({"ł": "l", "ø": "o", "đ": "d", "ħ": "h", "ı": "i", "ŀ": "l", "ß": "ss",
+                             "æ": "ae", "œ": "oe", "þ": "th", "ð": "d"})
+
+
+class Place(NamedTuple):
+    '''
+    One gazetteer entry.
+    '''
+    city_id: int
+    label: str
+    lat: float
+    lon: float
+    population: int
+
+
+def normalize_name(text: str) -> str:
+    '''
+    Fold a place name to the lowercase form used as index key. Latin letters
+    become ASCII; other scripts are kept, lowercased and without accents.
+    :param text: Place name or query.
+    :return: Normalised key, e.g. "Zürich" -> "zurich", "Łódź" -> "lodz".
+    '''
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower().translate(LATIN_FOLDS)
+    return " ".join("".join(c if c.isalnum() else " " for c in text).split())
+
+
+def iter_cities(path: str, chunk_size: int = 1 << 16):
+    '''
+    Stream city objects from an OpenWeatherMap city.list.json(.gz) file
+    without loading the whole document.
+    :param path: JSON array (optionally gzip-compressed) of city objects.
+    :param chunk_size: Characters read per chunk.
+    :return: Generator of dicts.
+    '''
+    opener = gzip.open if path.endswith(".gz") else open
+    decoder = json.JSONDecoder()
+    with opener(path, "rt", encoding="utf-8") as handle:
+        buffer, position = "", 0
+        while True:
+            # Skip array punctuation between objects
+            while position < len(buffer) and buffer[position] in " \t\r\n,[]":
+                position += 1
+            try:
+                city, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                chunk = handle.read(chunk_size)
+                if not chunk:
+                    return
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            position = end
+            yield city
+
+
+def city_label(city: dict) -> str:
+    '''
+    Build the display label for a city, e.g. "Omaha, NE, US".
+    '''
+    parts = [city.get("name", "")]
+    for field in ("state", "country"):
+        if city.get(field):
+            parts.append(city[field])
+    return ", ".join(parts)
+
+
+def build_index(source: str, index_path: str = None) -> int:
+    '''
+    Build the on-disk gazetteer index from a city list.
+    :param source: Path of city.list.json or city.list.json.gz.
+    :param index_path: Output file, defaults to gazetteer.idx in the data directory.
+    :return: Number of indexed places.
+    '''
+    index_path = index_path or data_path("gazetteer.idx")
+    entries = []
+    for city in iter_cities(source):
+        key = normalize_name(city.get("name", ""))
+        if not key:
+            continue
+        coord = city.get("coord") or {}
+        entries.append((key, -int(city.get("population") or 0), city_label(city), int(city.get("id") or 0),
+                        float(coord.get("lat") or 0.0), float(coord.get("lon") or 0.0)))
+    entries.sort()
+
+    # Most populous places for every short prefix
+    top = {}
+    for position, (key, negative_population, *_rest) in enumerate(entries):
+        for length in range(1, min(TOP_PREFIX, len(key)) + 1):
+            heap = top.setdefault(key[:length], [])
+            item = (-negative_population, -position)
+            if len(heap) < TOP_SIZE:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+    strings = bytearray()
+    records = bytearray()
+    for key, negative_population, label, city_id, lat, lon in entries:
+        key_bytes, label_bytes = key.encode("utf-8"), label.encode("utf-8")
+        records += RECORD.pack(len(strings), len(key_bytes), len(strings) + len(key_bytes), len(label_bytes),
+                               city_id, -negative_population, lat, lon)
+        strings += key_bytes + label_bytes
+
+    tops = bytearray()
+    for prefix in sorted(top):
+        ranked = [-position for _, position in sorted(top[prefix], reverse=True)]
+        ranked += [EMPTY] * (TOP_SIZE - len(ranked))
+        prefix_bytes = prefix.encode("utf-8")
+        tops += TOP.pack(prefix_bytes, len(prefix_bytes), *ranked)
+
+    strings_offset = HEADER.size + len(records) + len(tops)
+    temporary = index_path + ".tmp"
+    with open(temporary, "wb") as handle:
+        handle.write(HEADER.pack(MAGIC, VERSION, len(entries), len(top), strings_offset))
+        handle.write(records)
+        handle.write(tops)
+        handle.write(strings)
+    os.replace(temporary, index_path)
+    return len(entries)
+
+
+class Gazetteer:
+    '''
+    Memory-mapped, read-only view of a gazetteer index.
+
+    Records are sorted by normalised name, so prefix queries are a binary
+    search plus a short scan. Short prefixes use rankings precomputed at
+    build time, and typo-tolerant queries fall back to single-edit variants.
+    '''
+    def __init__(self, path: str = None) -> None:
+        '''
+        :param path: Index file, defaults to gazetteer.idx in the data directory.
+        :return: None
+        '''
+        with open(path or data_path("gazetteer.idx"), "rb") as handle:
+            self.mm = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self.top_count, self.strings_offset = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Unsupported gazetteer index")
+        self.top_offset = HEADER.size + self.count * RECORD.size
+        # The upper levels of every binary search probe the same records
+        self.key = functools.lru_cache(maxsize=8192)(self.read_key)
+        self._reverse = None
+        self._reverse_lock = threading.Lock()
+
+    @classmethod
+    def open_default(cls):
+        '''
+        Open the index in the data directory if one has been built.
+        :param: None
+        :return: Gazetteer, or None when no usable index exists.
+        '''
+        try:
+            return cls()
+        except (OSError, ValueError):
+            return None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def read_key(self, index: int) -> str:
+        '''
+        Decode the normalised name of one record.
+        :param index: Record number.
+        :return: str
+        '''
+        offset, length = struct.unpack_from("<IH", self.mm, HEADER.size + index * RECORD.size)
+        start = self.strings_offset + offset
+        return self.mm[start:start + length].decode("utf-8")
+
+    def place(self, index: int) -> Place:
+        '''
+        Decode one record.
+        :param index: Record number.
+        :return: Place
+        '''
+        _, _, label_offset, label_length, city_id, population, lat, lon = RECORD.unpack_from(
+            self.mm, HEADER.size + index * RECORD.size)
+        start = self.strings_offset + label_offset
+        return Place(city_id, self.mm[start:start + label_length].decode("utf-8"), lat, lon, population)
+
+    def population(self, index: int) -> int:
+        return struct.unpack_from("<I", self.mm, HEADER.size + index * RECORD.size + 16)[0]
+
+    def places(self):
+        '''
+        Iterate over every place in the index.
+        :param: None
+        :return: Generator of Place.
+        '''
+        for index in range(self.count):
+            yield self.place(index)
+
+    @property
+    def reverse(self):
+        '''
+        Reverse geocoder over every place, built on first use. That takes a
+        few seconds for the full city list, so call it from a worker thread.
+        :return: weather.spatial.ReverseGeocoder
+        '''
+        with self._reverse_lock:
+            if self._reverse is None:
+                from .spatial import ReverseGeocoder
+                self._reverse = ReverseGeocoder(self.places())
+            return self._reverse
+
+    def prefix_range(self, prefix: str) -> tuple:
+        '''
+        Find the records whose key starts with prefix.
+        :param prefix: Normalised prefix.
+        :return: (first, end) record numbers.
+        '''
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.key(middle) < prefix:
+                low = middle + 1
+            else:
+                high = middle
+        first = high = low
+        upper = self.count
+        while high < upper:
+            middle = (high + upper) // 2
+            if self.key(middle).startswith(prefix):
+                high = middle + 1
+            else:
+                upper = middle
+        return first, high
+
+    def top_ranked(self, prefix: str):
+        '''
+        Precomputed most populous records for a short prefix.
+        :param prefix: Normalised prefix of at most TOP_PREFIX characters.
+        :return: List of record numbers, or None when the prefix is unknown.
+        '''
+        target = prefix.encode("utf-8")
+        low, high = 0, self.top_count
+        while low < high:
+            middle = (low + high) // 2
+            entry = TOP.unpack_from(self.mm, self.top_offset + middle * TOP.size)
+            key = entry[0][:entry[1]]
+            if key == target:
+                return [index for index in entry[2:] if index != EMPTY]
+            if key < target:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def prefix_matches(self, prefix: str, limit: int, ranked: bool = True) -> list:
+        '''
+        Record numbers starting with prefix, exact names first, then by population.
+        :param prefix: Normalised prefix.
+        :param limit: Maximum number of results.
+        :param ranked: Allow the precomputed ranking, which holds only TOP_SIZE records.
+        :return: List of record numbers.
+        '''
+        first, end = self.prefix_range(prefix)
+        if first == end:
+            return []
+        if ranked and len(prefix) <= TOP_PREFIX and end - first > limit:
+            ranked = self.top_ranked(prefix)
+            if ranked is not None:
+                return ranked[:limit]
+        candidates = range(first, min(end, first + SCAN_LIMIT))
+        return sorted(candidates, key=lambda i: (self.key(i) != prefix, -self.population(i)))[:limit]
+
+    def search(self, query: str, limit: int = 10) -> list:
+        '''
+        Places matching a query such as "omaha" or "omaha, ne", tolerating one typo.
+        :param query: Free-text query; text after the first comma filters state/country.
+        :param limit: Maximum number of results.
+        :return: List of Place.
+        '''
+        name, _, qualifier = query.partition(",")
+        key = normalize_name(name)
+        if not key:
+            return []
+        filters = normalize_name(qualifier).split()
+        scan = limit if not filters else limit * 20
+
+        # A state/country filter needs more candidates than a precomputed ranking holds
+        indexes = self.prefix_matches(key, scan, ranked=not filters)
+        if not indexes and len(key) >= 3:
+            # Only a prefix nothing starts with is taken for a typo
+            seen = set()
+            for variant in self.edits(key):
+                for index in self.prefix_matches(variant, scan, ranked=not filters):
+                    if index not in seen:
+                        seen.add(index)
+                        indexes.append(index)
+                if len(indexes) >= scan:
+                    break
+
+        results = []
+        for index in indexes:
+            place = self.place(index)
+            label_words = normalize_name(place.label).split()
+            if all(any(word.startswith(f) for word in label_words) for f in filters):
+                results.append(place)
+                if len(results) == limit:
+                    break
+        return results
+
+    def suggest(self, query: str, limit: int = 10) -> list:
+        '''
+        Display labels for a suggestion list.
+        :param query: Free-text query.
+        :param limit: Maximum number of results.
+        :return: List of labels like "Omaha, NE, US".
+        '''
+        return [place.label for place in self.search(query, limit)]
+
+    @staticmethod
+    def edits(key: str):
+        '''
+        Single-edit variants of a key: transpositions and deletions first, as the cheapest
+        and most common typos, then substitutions and insertions.
+        '''
+        seen = {key}
+        splits = [(key[:i], key[i:]) for i in range(len(key) + 1)]
+        candidates = [a + b[1] + b[0] + b[2:] for a, b in splits if len(b) > 1]
+        candidates += [a + b[1:] for a, b in splits if b]
+        candidates += [a + c + b[1:] for a, b in splits if b for c in ALPHABET]
+        candidates += [a + c + b for a, b in splits for c in ALPHABET]
+        for candidate in candidates:
+            candidate = candidate.strip()
+            if candidate and candidate not in seen:
+                seen.add(candidate)
+                yield candidate
+
+    def close(self) -> None:
+        self.mm.close()
+
+
+def main() -> None:
+    '''
+    Command line entry point: build the index from a downloaded city list.
+    :return: None
+    '''
+    parser = argparse.ArgumentParser(description="Build the offline city gazetteer index.")
+    parser.add_argument("source", help="OpenWeatherMap city.list.json or city.list.json.gz")
+    parser.add_argument("-o", "--output", help="index file (default: gazetteer.idx in the data directory)")
+    args = parser.parse_args()
+    count = build_index(args.source, args.output)
+    print(f"Indexed {count} places")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from .cache import normalize_key
+from .metrics import GEOCODER_LOOKUPS, stage
+from .paths import data_path
+from .scheduler import INTERACTIVE, default_scheduler
+
+USER_AGENT = "Weather app (mail@gmail.com)"
+
+
+class Geocoder:
+    '''
+    Memoizing front end to Nominatim city search.
+
+    Results are kept in a bounded in-memory LRU backed by an SQLite table
+    with expiry. A query that only appends whole words to a cached query is
+    answered by filtering the shorter query's results, provided that result
+    list was complete (shorter than the request limit). One geolocator is
+    created on first use and shared by every lookup.
+    '''
+    def __init__(self, path: str = None, max_entries: int = 256, ttl: float = 30 * 24 * 3600,
+                 limit: int = 10, user_agent: str = USER_AGENT, scheduler=None, url: str = None) -> None:
+        '''
+        :param path: Database file, defaults to geocode_cache.sqlite3 in the data directory.
+        :param max_entries: Queries kept in memory.
+        :param ttl: Seconds before a cached result is looked up again.
+        :param limit: Maximum number of results requested from Nominatim.
+        :param user_agent: User agent sent to Nominatim.
+        :param scheduler: RequestScheduler that budgets calls, defaults to the shared one.
+        :param url: Nominatim root such as http://127.0.0.1:8089, defaults to $WEATHER_NOMINATIM_URL,
+            then the public service.
+        :return: None
+        '''
+        self.url = url or os.environ.get("WEATHER_NOMINATIM_URL") or None
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.limit = limit
+        self.user_agent = user_agent
+        self.scheduler = scheduler or default_scheduler()
+        self.memory = OrderedDict()  # key -> (addresses, complete, stored_at)
+        self._geolocator = None
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path or data_path("geocode_cache.sqlite3"), check_same_thread=False)
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS geocode ("
+                " key TEXT PRIMARY KEY,"
+                " addresses TEXT NOT NULL,"
+                " complete INTEGER NOT NULL,"
+                " stored_at REAL NOT NULL)"
+            )
+
+    @property
+    def geolocator(self):
+        '''
+        The shared Nominatim client, created on first use.
+        '''
+        if self._geolocator is None:
+            from geopy.geocoders import Nominatim
+            if self.url:
+                scheme, _, domain = self.url.rstrip("/").partition("://")
+                self._geolocator = Nominatim(user_agent=self.user_agent, domain=domain, scheme=scheme)
+            else:
+                self._geolocator = Nominatim(user_agent=self.user_agent)
+        return self._geolocator
+
+    def search(self, query: str, priority: int = INTERACTIVE) -> list:
+        '''
+        Return the addresses matching a city query.
+        Network lookups wait for the scheduler's "nominatim" budget.
+        Geocoder errors (e.g. GeocoderTimedOut) propagate and are not cached.
+        :param query: Free-text city name.
+        :param priority: scheduler.INTERACTIVE or scheduler.BACKGROUND.
+        :return: List of address strings, empty when nothing matches.
+        '''
+        key = normalize_key(query)
+        cached = self.lookup(key)
+        if cached is not None:
+            return cached
+
+        GEOCODER_LOOKUPS.inc(result="network")
+        self.scheduler.acquire("nominatim", priority)
+        with stage("geocode"):
+            locations = self.geolocator.geocode(query, exactly_one=False, language='en', limit=self.limit)
+        addresses = [loc.address for loc in locations or []]
+        self.store(key, addresses, len(addresses) < self.limit)
+        return addresses
+
+    def lookup(self, key: str):
+        '''
+        Answer a normalised query from memory, disk or a cached shorter query.
+        :param key: Normalised query.
+        :return: List of addresses, or None on a miss.
+        '''
+        now = time.time()
+        with self._lock:
+            entry = self.memory.get(key)
+            if entry is None:
+                entry = self._load(key)
+            if entry is not None and now - entry[2] < self.ttl:
+                self._remember(key, entry)
+                GEOCODER_LOOKUPS.inc(result="hit")
+                return list(entry[0])
+
+            # Refinement of a cached query: "omaha" -> "omaha, ne"
+            words = key.replace(",", " ").split()
+            for prefix, (addresses, complete, stored_at) in self.memory.items():
+                if not complete or now - stored_at >= self.ttl or prefix == key:
+                    continue
+                if not key.startswith(prefix) or key[len(prefix)] not in " ,":
+                    continue
+                matches = [a for a in addresses if self._contains_words(a, words)]
+                if matches:
+                    GEOCODER_LOOKUPS.inc(result="refined")
+                    return matches
+        return None
+
+    def store(self, key: str, addresses: list, complete: bool) -> None:
+        '''
+        Cache the addresses for a normalised query in memory and on disk.
+        :param key: Normalised query.
+        :param addresses: Result list.
+        :param complete: True when Nominatim returned fewer results than the limit.
+        :return: None
+        '''
+        entry = (addresses, complete, time.time())
+        with self._lock:
+            self._remember(key, entry)
+            with self.db:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO geocode (key, addresses, complete, stored_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(addresses), int(complete), entry[2]),
+                )
+                self.db.execute("DELETE FROM geocode WHERE stored_at < ?", (entry[2] - self.ttl,))
+
+    def _remember(self, key: str, entry: tuple) -> None:
+        '''
+        Insert or refresh an entry in the LRU, dropping the oldest when full.
+        '''
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _load(self, key: str):
+        '''
+        Read an entry from the database.
+        '''
+        row = self.db.execute("SELECT addresses, complete, stored_at FROM geocode WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), bool(row[1]), row[2]
+
+    @staticmethod
+    def _contains_words(address: str, words: list) -> bool:
+        '''
+        True when every query word starts some word of the address.
+        '''
+        address_words = address.lower().replace(",", " ").split()
+        return all(any(a.startswith(w) for a in address_words) for w in words)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, NamedTuple
+
+from .cache import normalize_key
+from .paths import data_path
+from .units import DEFAULT_UNITS, convert_speed, to_kelvin
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Numeric columns stored per observation, in table order
+FIELDS = ("temp", "feels_like", "humidity", "pressure", "wind_speed", "wind_deg")
+
+
+class Series(NamedTuple):
+    '''
+    Observations of one city over a time range, one array element per observation.
+    Temperatures are in Kelvin and wind speed in m/s, as the API returns them.
+    '''
+    times: "np.ndarray"
+    temp: "np.ndarray"
+    feels_like: "np.ndarray"
+    humidity: "np.ndarray"
+    pressure: "np.ndarray"
+    wind_speed: "np.ndarray"
+    wind_deg: "np.ndarray"
+
+
+class HistoryStore:
+    '''
+    Append-only SQLite log of every observation received.
+
+    Values are stored in standard units (Kelvin, m/s) whatever the
+    responses were requested in. Rows are keyed by (city_id, dt) in a WITHOUT ROWID table, so the data is
+    stored clustered by city and time: appends cost one B-tree insert, a
+    repeated observation is ignored by the primary key, and a time-range
+    scan reads consecutive pages. Appends are buffered and written with one
+    executemany per batch. Queries are mapped to city IDs in a separate
+    table, so the same city reached through different spellings has a single
+    history.
+    '''
+    def __init__(self, path: str = None, batch_size: int = 500, flush_interval: float = 30.0) -> None:
+        '''
+        :param path: Database file, defaults to history.sqlite3 in the data directory.
+        :param batch_size: Buffered observations that trigger a write.
+        :param flush_interval: Seconds after which buffered observations are written anyway.
+        :return: None
+        '''
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.pending_locations = {}
+        self.oldest_pending = None
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path or data_path("history.sqlite3"), check_same_thread=False)
+        with self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS observations ("
+                " city_id INTEGER NOT NULL,"
+                " dt INTEGER NOT NULL,"
+                " temp REAL, feels_like REAL, humidity REAL, pressure REAL, wind_speed REAL, wind_deg REAL,"
+                " PRIMARY KEY (city_id, dt)) WITHOUT ROWID"
+            )
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS locations ("
+                " key TEXT PRIMARY KEY,"
+                " city_id INTEGER NOT NULL)"
+            )
+
+    def record_response(self, query: str, response: dict, units: str = DEFAULT_UNITS) -> None:
+        '''
+        Append the observation in a decoded /weather response.
+        Responses without a city ID or observation time are ignored.
+        :param query: Location query that produced the response.
+        :param response: Decoded OpenWeatherMap response.
+        :param units: Unit system the response was requested in.
+        :return: None
+        '''
+        city_id, observed_at = response.get("id"), response.get("dt")
+        if not city_id or not observed_at:
+            return
+        main, wind = response.get("main", {}), response.get("wind", {})
+        temp, feels_like, speed = main.get("temp"), main.get("feels_like"), wind.get("speed")
+        if units != DEFAULT_UNITS:
+            temp = None if temp is None else to_kelvin(temp, units)
+            feels_like = None if feels_like is None else to_kelvin(feels_like, units)
+            speed = None if speed is None else convert_speed(speed, units, DEFAULT_UNITS)
+        row = (city_id, observed_at, temp, feels_like, main.get("humidity"), main.get("pressure"), speed,
+               wind.get("deg"))
+        self.append([row], {normalize_key(query): city_id} if query else {})
+
+    def record(self, snapshot) -> None:
+        '''
+        Append the observation of a WeatherSnapshot.
+        :param snapshot: weather.core.WeatherSnapshot
+        :return: None
+        '''
+        from .units import convert_snapshot
+        snapshot = convert_snapshot(snapshot, DEFAULT_UNITS)
+        row = (snapshot.city_id, snapshot.observed_at) + tuple(getattr(snapshot, field) for field in FIELDS)
+        self.append([row], {normalize_key(snapshot.query): snapshot.city_id} if snapshot.query else {})
+
+    def append(self, rows: list, locations: dict = None) -> None:
+        '''
+        Buffer raw rows and write them once the batch is full or old enough.
+        :param rows: Tuples of (city_id, dt) followed by the FIELDS values.
+        :param locations: dict of normalised query -> city_id to remember.
+        :return: None
+        '''
+        with self._lock:
+            self.pending.extend(rows)
+            self.pending_locations.update(locations or {})
+            now = time.monotonic()
+            if self.oldest_pending is None:
+                self.oldest_pending = now
+            if len(self.pending) >= self.batch_size or now - self.oldest_pending >= self.flush_interval:
+                self._flush()
+
+    def flush(self) -> None:
+        '''
+        Write all buffered observations.
+        :param: None
+        :return: None
+        '''
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        '''
+        Write the buffer in one transaction. Caller holds the lock.
+        '''
+        if not self.pending and not self.pending_locations:
+            return
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO observations VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self.pending)
+            self.db.executemany("INSERT OR REPLACE INTO locations (key, city_id) VALUES (?, ?)",
+                                self.pending_locations.items())
+        self.pending = []
+        self.pending_locations = {}
+        self.oldest_pending = None
+
+    def city_id(self, location) -> int:
+        '''
+        Resolve a location to the city ID its history is stored under.
+        :param location: City ID, or a query that has been recorded before.
+        :return: City ID, or 0 when the query is unknown.
+        '''
+        if isinstance(location, int):
+            return location
+        key = normalize_key(location)
+        with self._lock:
+            if key in self.pending_locations:
+                return self.pending_locations[key]
+            row = self.db.execute("SELECT city_id FROM locations WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def range(self, location, start: float = None, end: float = None) -> Series:
+        '''
+        Observations of a city within a time range, oldest first.
+        :param location: City ID or a recorded query.
+        :param start: First Unix time included, None for the beginning.
+        :param end: Last Unix time included, None for the end.
+        :return: Series of arrays, empty when nothing matches.
+        '''
+        import numpy as np  # Not at module level: the GUI records observations long before it reads any
+        city_id = self.city_id(location)
+        self.flush()
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT dt, " + ", ".join(FIELDS) + " FROM observations"
+                " WHERE city_id = ? AND dt BETWEEN ? AND ? ORDER BY dt",
+                (city_id, int(start) if start is not None else -2 ** 63, int(end) if end is not None else 2 ** 63 - 1),
+            ).fetchall()
+        columns = np.array(rows, dtype=np.float64).reshape(-1, len(FIELDS) + 1)
+        return Series(columns[:, 0].astype(np.int64), *(columns[:, i + 1] for i in range(len(FIELDS))))
+
+    def names(self) -> dict:
+        '''
+        One recorded query per city, for labelling reports.
+        :param: None
+        :return: dict of city_id -> normalised query.
+        '''
+        self.flush()
+        with self._lock:
+            return {city_id: key for key, city_id in
+                    self.db.execute("SELECT MIN(key), city_id FROM locations GROUP BY city_id")}
+
+    def cities(self) -> list:
+        '''
+        City IDs with at least one observation.
+        :param: None
+        :return: list of int
+        '''
+        self.flush()
+        with self._lock:
+            return [row[0] for row in self.db.execute("SELECT DISTINCT city_id FROM observations ORDER BY city_id")]
+
+    def count(self, location=None) -> int:
+        '''
+        Number of stored observations, for one city or in total.
+        :param location: City ID or recorded query, None for all cities.
+        :return: int
+        '''
+        city_id = None if location is None else self.city_id(location)
+        self.flush()
+        with self._lock:
+            if city_id is None:
+                return self.db.execute("SELECT COUNT(*) FROM observations").fetchone()[0]
+            return self.db.execute("SELECT COUNT(*) FROM observations WHERE city_id = ?", (city_id,)).fetchone()[0]
+
+    def close(self) -> None:
+        '''
+        Write buffered observations and close the database.
+        :param: None
+        :return: None
+        '''
+        with self._lock:
+            self._flush()
+            self.db.close()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import os
+
+from PyQt5.QtCore import QObject, QSize, Qt, QTimer
+from PyQt5.QtGui import QPixmap, QPixmapCache
+
+from .metrics import CACHE_LOOKUPS, stage
+from .paths import icon_dir
+
+# Every OpenWeatherMap condition icon, day and night variants
+ICON_CODES = [f"{number:02d}{period}" for number in (1, 2, 3, 4, 9, 10, 11, 13, 50) for period in "dn"]
+
+
+class IconStore(QObject):
+    '''
+    Decoded, pre-scaled condition icons kept in QPixmapCache.
+
+    Each PNG is decoded from disk once, and each (icon, size, device pixel
+    ratio) combination is scaled once, so showing an icon on the update path
+    is a cache lookup. preload() fills the cache one icon per event-loop pass
+    so the window never stalls; invalidate() drops scaled copies after a
+    resize or DPI change.
+    '''
+    def __init__(self, directory: str = None, parent: QObject = None) -> None:
+        '''
+        :param directory: Folder of <code>.png files, defaults to paths.icon_dir().
+        :param parent: Owning QObject.
+        :return: None
+        '''
+        super().__init__(parent)
+        self.directory = directory or icon_dir()
+        self.scaled_keys = set()
+        self.pending = []
+        self.preload_timer = QTimer(self)
+        self.preload_timer.timeout.connect(self.preload_next)
+
+    def decoded(self, code: str) -> QPixmap:
+        '''
+        Full-size icon, read from disk on first use.
+        :param code: Icon code such as "01d".
+        :return: QPixmap, null if the file does not exist.
+        '''
+        key = f"icon:{code}"
+        pixmap = QPixmapCache.find(key)
+        if pixmap is None:
+            with stage("icon_decode"):
+                pixmap = QPixmap(os.path.join(self.directory, f"{code}.png"))
+            QPixmapCache.insert(key, pixmap)
+        return pixmap
+
+    def pixmap(self, code: str, size: QSize, ratio: float = 1.0) -> QPixmap:
+        '''
+        Icon scaled to fit a widget, at the screen's device pixel ratio.
+        :param code: Icon code such as "01d".
+        :param size: Logical size of the target widget.
+        :param ratio: Device pixel ratio of the target widget.
+        :return: QPixmap ready for QLabel.setPixmap without further scaling.
+        '''
+        key = f"icon:{code}:{size.width()}x{size.height()}@{ratio:g}"
+        pixmap = QPixmapCache.find(key)
+        CACHE_LOOKUPS.inc(cache="icon", result="miss" if pixmap is None else "hit")
+        if pixmap is None:
+            source = self.decoded(code)
+            if source.isNull():
+                return source
+            with stage("icon_scale"):
+                pixmap = source.scaled(size * ratio, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            pixmap.setDevicePixelRatio(ratio)
+            QPixmapCache.insert(key, pixmap)
+        self.scaled_keys.add(key)
+        return pixmap
+
+    def preload(self, size: QSize, ratio: float = 1.0) -> None:
+        '''
+        Decode and scale every icon in the background, one per event-loop pass.
+        :param size: Logical size of the target widget.
+        :param ratio: Device pixel ratio of the target widget.
+        :return: None
+        '''
+        self.pending = [(code, QSize(size), ratio) for code in ICON_CODES]
+        self.preload_timer.start(0)
+
+    def preload_next(self) -> None:
+        if not self.pending:
+            self.preload_timer.stop()
+            return
+        self.pixmap(*self.pending.pop())
+
+    def invalidate(self) -> None:
+        '''
+        Drop all scaled copies (decoded originals are kept).
+        :param: None
+        :return: None
+        '''
+        self.pending = []
+        self.preload_timer.stop()
+        for key in self.scaled_keys:
+            QPixmapCache.remove(key)
+        self.scaled_keys.clear()
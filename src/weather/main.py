@@ -1,15 +1,45 @@
 #!/usr/bin/env python3
+'''
+GUI entry point.
+
+Only PyQt5 and the window modules are imported before the first frame;
+requests, geopy and NumPy load on first use. Run with --profile-startup
+to print when each startup milestone was reached.
+'''
+
+import sys
+
+from .metrics import STARTUP  # first, so the profile starts with the process
 
-from .weather import *
 
 def main() -> None:
     '''
     Main entry point - Start QApplication, Call Controller Class
     :return: None
     '''
+    profile = "--profile-startup" in sys.argv[1:]
+    from PyQt5.QtWidgets import QApplication
     application = QApplication([])
-    Controller()
+    STARTUP.mark("qt_ready")
+    from .weather import Controller
+    STARTUP.mark("modules_imported")
+    if profile:
+        STARTUP.listener = print_startup_report
+    application.controller = Controller()  # a window without a Python reference is garbage-collected
     application.exec_()
 
+
+def print_startup_report(name: str, seconds: float) -> None:
+    '''
+    Print the startup profile once the first weather (or the first failure) is shown.
+    :param name: Milestone just reached.
+    :param seconds: Its time since launch.
+    :return: None
+    '''
+    if name in ("weather_shown", "fetch_failed"):
+        print(STARTUP.report(), file=sys.stderr)
+        STARTUP.listener = None
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+'''
+Counters, histograms and stage timers for the fetch and render path.
+
+One process-wide registry collects HTTP latencies (split by whether a new
+connection, i.e. DNS and TLS, was paid for), cache and geocoder hit counts,
+and the duration of every named stage: headers, body, JSON decoding,
+parsing, icon loading, model updates and display. It renders in the
+Prometheus text format (served by the proxy at /metrics, or written to a
+file) and every event can also go to a JSON Lines log. Recording costs a
+lock and a bisect, so instrumentation stays on in production. Like core,
+this module does not import PyQt5.
+'''
+
+import bisect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram upper bounds in seconds: from a model update to a slow upstream call
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Heavy dependencies the GUI loads on first use; the startup profile reports when each arrived
+DEFERRED_MODULES = ("requests", "geopy", "numpy")
+
+logger = logging.getLogger("weather.metrics")
+
+
+def _label_text(names: tuple, values: tuple, extra: str = "") -> str:
+    '''
+    Prometheus label set, e.g. {stage="parse",le="0.01"}.
+    '''
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    '''
+    Values of one metric, keyed by label values.
+    '''
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()) -> None:
+        '''
+        :param name: Metric name.
+        :param help: One line description.
+        :param labels: Label names.
+        :return: None
+        '''
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def _matches(self, key: tuple, labels: dict) -> bool:
+        '''
+        True when key has the given values; labels not given match anything.
+        '''
+        return all(key[self.labels.index(name)] == str(value) for name, value in labels.items())
+
+
+class Counter(Metric):
+    '''
+    Monotonic count per label combination. Names end in _total.
+    '''
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        '''
+        :param labels: Label values to match; omitted labels match anything.
+        :return: Sum over the matching label combinations.
+        '''
+        with self._lock:
+            return sum(count for key, count in self.values.items() if self._matches(key, labels))
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted(self.values.items())
+        return [f"{self.name}{_label_text(self.labels, key)} {_number(count)}" for key, count in items]
+
+
+class Histogram(Metric):
+    '''
+    Bucketed distribution per label combination, with sum and count.
+    '''
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> None:
+        '''
+        :param name: Metric name, ending in the unit, e.g. _seconds.
+        :param help: One line description.
+        :param labels: Label names.
+        :param buckets: Ascending upper bounds; +Inf is implied.
+        :return: None
+        '''
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def _merged(self, labels: dict):
+        '''
+        Bucket counts, sum and count over the label combinations matching labels.
+        '''
+        counts, total, count = [0] * (len(self.buckets) + 1), 0.0, 0
+        with self._lock:
+            for key, (bucket_counts, bucket_sum, bucket_count) in self.values.items():
+                if self._matches(key, labels):
+                    counts = [a + b for a, b in zip(counts, bucket_counts)]
+                    total += bucket_sum
+                    count += bucket_count
+        return counts, total, count
+
+    def value(self, **labels) -> float:
+        '''
+        :return: Number of observations matching labels.
+        '''
+        return self._merged(labels)[2]
+
+    def mean(self, **labels) -> float:
+        _, total, count = self._merged(labels)
+        return total / count if count else 0.0
+
+    def quantile(self, q: float, **labels) -> float:
+        '''
+        Estimate a quantile by linear interpolation within its bucket, as Prometheus' histogram_quantile does.
+        :param q: Quantile, 0..1.
+        :param labels: Label values to match.
+        :return: Seconds, 0.0 without observations.
+        '''
+        counts, _, count = self._merged(labels)
+        if not count:
+            return 0.0
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self.values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {count}")
+        return lines
+
+
+class Registry:
+    '''
+    Named metrics of one process.
+    '''
+    def __init__(self) -> None:
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+        return self._register(Counter, name, help, labels)
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help, labels, buckets)
+
+    def _register(self, cls, name: str, *args):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args)
+            return metric
+
+    def render(self) -> str:
+        '''
+        All metrics in the Prometheus text exposition format.
+        :param: None
+        :return: str
+        '''
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        '''
+        Write render() to a file atomically, e.g. for node_exporter's textfile collector.
+        :param path: Target file.
+        :return: None
+        '''
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            handle.write(self.render())
+        os.replace(temporary, path)
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "weather_stage_seconds", "Duration of one fetch or render stage.", ("stage",))
+HTTP_SECONDS = REGISTRY.histogram(
+    "weather_http_request_seconds", "Duration of one HTTP attempt; connection=new includes DNS, TCP and TLS setup.",
+    ("endpoint", "status", "connection"))
+CACHE_LOOKUPS = REGISTRY.counter(
+    "weather_cache_lookups_total", "Cache lookups by cache and result (hit or miss).", ("cache", "result"))
+GEOCODER_LOOKUPS = REGISTRY.counter(
+    "weather_geocoder_lookups_total", "City searches by how they were answered (hit, refined or network).",
+    ("result",))
+STALLS = REGISTRY.counter(
+    "weather_event_loop_stalls_total", "Times the GUI event loop was blocked longer than the stall threshold.")
+STALL_SECONDS = REGISTRY.histogram(
+    "weather_event_loop_stall_seconds", "How long the GUI event loop was blocked, per stall.")
+
+
+def log_event(event: str, level: int = logging.DEBUG, **fields) -> None:
+    '''
+    Write one JSON object to the weather.metrics log, if that level is enabled.
+    :param event: Event name, e.g. "stage" or "stall".
+    :param level: logging level.
+    :param fields: JSON-serialisable values.
+    :return: None
+    '''
+    if logger.isEnabledFor(level):
+        logger.log(level, json.dumps({"ts": round(time.time(), 6), "event": event, **fields}))
+
+
+def observe_stage(name: str, seconds: float, **fields) -> None:
+    '''
+    Record a stage whose duration was measured elsewhere.
+    :param name: Stage name.
+    :param seconds: Duration.
+    :param fields: Extra log fields.
+    :return: None
+    '''
+    STAGE_SECONDS.observe(seconds, stage=name)
+    log_event("stage", stage=name, seconds=round(seconds, 6), **fields)
+
+
+@contextmanager
+def stage(name: str, **fields):
+    '''
+    Time the enclosed block as a stage; recorded even when it raises.
+    :param name: Stage name, e.g. "parse".
+    :param fields: Extra log fields.
+    '''
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start, **fields)
+
+
+def configure_log(path: str = None, level: int = logging.DEBUG) -> bool:
+    '''
+    Send the metrics log to a JSON Lines file.
+    :param path: Log file, defaults to $WEATHER_METRICS_LOG; nothing is logged without one.
+    :param level: logging.DEBUG logs every stage, logging.INFO only failures and stalls.
+    :return: True when a log file was configured.
+    '''
+    path = path or os.environ.get("WEATHER_METRICS_LOG")
+    if not path:
+        return False
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    return True
+
+
+class StallDetector:
+    '''
+    Detects a blocked event loop from late heartbeats.
+
+    The GUI calls beat() from a repeating timer; a beat that arrives more than
+    threshold seconds after it was due means the loop was busy for that long.
+    '''
+    def __init__(self, interval: float = 0.1, threshold: float = 0.1) -> None:
+        '''
+        :param interval: Seconds between heartbeats.
+        :param threshold: Lateness in seconds counted as a stall.
+        :return: None
+        '''
+        self.interval = interval
+        self.threshold = threshold
+        self.last_beat = None
+        self.longest = 0.0
+
+    def beat(self) -> float:
+        '''
+        :param: None
+        :return: The stall that just ended in seconds, 0.0 if none.
+        '''
+        now = time.perf_counter()
+        late = 0.0 if self.last_beat is None else now - self.last_beat - self.interval
+        self.last_beat = now
+        if late <= self.threshold:
+            return 0.0
+        STALLS.inc()
+        STALL_SECONDS.observe(late)
+        self.longest = max(self.longest, late)
+        log_event("stall", logging.INFO, seconds=round(late, 6))
+        return late
+
+    def reset(self) -> None:
+        '''
+        Forget the last heartbeat, e.g. after the timer was stopped.
+        '''
+        self.last_beat = None
+
+
+class StartupProfile:
+    '''
+    Milestones of application startup, in seconds since the profile was created.
+    Each milestone is kept once and also recorded as a "startup_<name>" stage.
+    '''
+    def __init__(self) -> None:
+        self.origin = time.perf_counter()
+        self.marks = {}
+        self.loaded = {}
+        self.listener = None  # called with (name, seconds) for every new milestone
+
+    def mark(self, name: str) -> None:
+        '''
+        Record a milestone unless it was reached before.
+        :param name: Milestone, e.g. "first_paint".
+        :return: None
+        '''
+        if name in self.marks:
+            return
+        seconds = time.perf_counter() - self.origin
+        self.marks[name] = seconds
+        self.loaded[name] = [module for module in DEFERRED_MODULES if module in sys.modules]
+        observe_stage("startup_" + name, seconds)
+        if self.listener is not None:
+            self.listener(name, seconds)
+
+    def report(self) -> str:
+        '''
+        The milestones as a table, with the deferred modules loaded by each.
+        :param: None
+        :return: str
+        '''
+        lines = ["Startup profile (ms since launch, +ms since the previous milestone, heavy modules loaded):"]
+        previous = 0.0
+        for name, seconds in self.marks.items():
+            modules = ", ".join(self.loaded[name]) or "-"
+            lines.append(f"  {name:<18} {seconds * 1000:8.1f} {(seconds - previous) * 1000:+8.1f}  {modules}")
+            previous = seconds
+        return "\n".join(lines)
+
+
+STARTUP = StartupProfile()
+
+
+def overlay_text() -> str:
+    '''
+    One-line summary for the status bar.
+    :param: None
+    :return: str
+    '''
+    hits, misses = CACHE_LOOKUPS.value(cache="weather", result="hit"), CACHE_LOOKUPS.value(cache="weather",
+                                                                                            result="miss")
+    ratio = f"{100 * hits / (hits + misses):.0f}%" if hits + misses else "-"
+    return (f"HTTP p50 {HTTP_SECONDS.quantile(0.5) * 1000:.0f} ms p95 {HTTP_SECONDS.quantile(0.95) * 1000:.0f} ms"
+            f" ({HTTP_SECONDS.value():.0f}, {HTTP_SECONDS.value(connection='new'):.0f} new conn)"
+            f" | cache {ratio}"
+            f" | geocoder {GEOCODER_LOOKUPS.value(result='network'):.0f}"
+            f" | model {STAGE_SECONDS.mean(stage='model_update') * 1000:.1f} ms"
+            f" | display {STAGE_SECONDS.mean(stage='display_weather') * 1000:.1f} ms"
+            f" | stalls {STALLS.value():.0f}")
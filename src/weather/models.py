@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+from difflib import SequenceMatcher
+from typing import NamedTuple
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+
+from .metrics import stage
+
+
+class Row(NamedTuple):
+    '''
+    One list line: the displayed text and an optional value for Qt.UserRole.
+    '''
+    text: str
+    value: object = None
+
+
+class RowListModel(QAbstractListModel):
+    '''
+    List model that updates by diffing instead of resetting.
+
+    set_rows() compares the new rows with the current ones and emits
+    dataChanged, rowsInserted and rowsRemoved only for the rows that
+    differ, so a refresh that changes one line repaints one line and the
+    view keeps its scroll position and selection.
+    '''
+    def __init__(self, parent=None) -> None:
+        '''
+        :param parent: Owning QObject.
+        :return: None
+        '''
+        super().__init__(parent)
+        self.rows = []
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self.rows):
+            return None
+        row = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return row.text
+        if role == Qt.UserRole:
+            return row.value
+        return None
+
+    def set_rows(self, rows: list) -> None:
+        '''
+        Replace the contents, signalling only the rows that changed.
+        :param rows: Row tuples or plain strings.
+        :return: None
+        '''
+        with stage("model_update", rows=len(rows)):
+            new = [row if isinstance(row, Row) else Row(str(row)) for row in rows]
+            matcher = SequenceMatcher(None, self.rows, new, autojunk=False)
+            offset = 0
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                if tag == "equal":
+                    continue
+                start = i1 + offset
+                old_count, new_count = i2 - i1, j2 - j1
+                common = min(old_count, new_count)
+                if common:
+                    self.rows[start:start + common] = new[j1:j1 + common]
+                    self.dataChanged.emit(self.index(start), self.index(start + common - 1))
+                if new_count > old_count:
+                    self.beginInsertRows(QModelIndex(), start + common, start + new_count - 1)
+                    self.rows[start + common:start + common] = new[j1 + common:j2]
+                    self.endInsertRows()
+                elif old_count > new_count:
+                    self.beginRemoveRows(QModelIndex(), start + common, start + old_count - 1)
+                    del self.rows[start + common:start + old_count]
+                    self.endRemoveRows()
+                offset += new_count - old_count
+
+    def clear(self) -> None:
+        '''
+        Remove every row.
+        :param: None
+        :return: None
+        '''
+        self.set_rows([])
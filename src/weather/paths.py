@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+
+APP_NAME = "WeatherApp"
+
+
+def data_dir() -> str:
+    '''
+    Return the per-user directory for caches and indexes, creating it if needed.
+    WEATHER_DATA_DIR overrides the platform default.
+    :param: None
+    :return: Absolute path of the data directory.
+    '''
+    path = os.environ.get("WEATHER_DATA_DIR")
+    if not path:
+        if sys.platform.startswith("win"):
+            base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        elif sys.platform == "darwin":
+            base = os.path.expanduser("~/Library/Application Support")
+        else:
+            base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+        path = os.path.join(base, APP_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def data_path(name: str) -> str:
+    '''
+    Return the path of a file inside the data directory.
+    :param name: File name.
+    :return: Absolute path.
+    '''
+    return os.path.join(data_dir(), name)
+
+
+def icon_dir() -> str:
+    '''
+    Locate the condition icons: src/icons in an installed tree, icons/ in a checkout.
+    :param: None
+    :return: Absolute path of the first existing candidate.
+    '''
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    candidates = [os.path.join(package_parent, "icons"), os.path.join(os.path.dirname(package_parent), "icons")]
+    for candidate in candidates:
+        if os.path.isdir(candidate):
+            return candidate
+    return candidates[0]
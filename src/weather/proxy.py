@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .cache import WeatherCache, normalize_key
+from .core import WeatherClient, WeatherSnapshot
+from .metrics import CACHE_LOOKUPS, REGISTRY
+from .transport import TransportError
+from .units import DEFAULT_UNITS, UNIT_SYSTEMS
+
+
+class SingleFlight:
+    '''
+    Collapse concurrent calls for the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait and receive the same result (or exception).
+    '''
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key: str, fn):
+        '''
+        :param key: Identity of the call.
+        :param fn: Zero-argument callable.
+        :return: fn's result.
+        '''
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"event": threading.Event(), "result": None, "error": None}
+                self.executions += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call["event"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except Exception as exc:
+            call["error"] = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["event"].set()
+
+
+class WeatherProxy:
+    '''
+    Shared, cached front end to the OpenWeatherMap /weather, /forecast and /group endpoints.
+    '''
+    def __init__(self, client: WeatherClient) -> None:
+        '''
+        :param client: Upstream client; its cache provides the TTL.
+        :return: None
+        '''
+        self.client = client
+        self.flights = SingleFlight()
+
+    def current_response(self, query: str, units: str = DEFAULT_UNITS) -> dict:
+        '''
+        Upstream-format response for a location, fetched at most once per TTL
+        no matter how many clients ask concurrently.
+        :param query: Location query.
+        :param units: Unit system to request.
+        :return: The decoded OpenWeatherMap response.
+        '''
+        return self.flights.do(normalize_key(self.client.cache_key(query, units)),
+                               lambda: self.client.current_response(query, units=units))
+
+    def forecast_response(self, query: str, units: str = DEFAULT_UNITS) -> dict:
+        '''
+        Upstream-format forecast for a location, coalesced like current_response.
+        :param query: Location query.
+        :param units: Unit system to request.
+        :return: The decoded OpenWeatherMap response.
+        '''
+        return self.flights.do("forecast:" + normalize_key(self.client.cache_key(query, units)),
+                               lambda: self.client.forecast_response(query, units=units))
+
+    def group_response(self, city_ids: list, units: str = DEFAULT_UNITS) -> dict:
+        '''
+        Upstream-format /group response for a set of city IDs, cached under
+        "group:<ids>" and coalesced like current_response.
+        :param city_ids: OpenWeatherMap city IDs.
+        :param units: Unit system to request.
+        :return: {"cnt": ..., "list": [...]} as the API returns it.
+        '''
+        key = "group:" + normalize_key(self.client.cache_key(",".join(str(city_id) for city_id in city_ids), units))
+        cache = self.client.cache
+
+        def fetch() -> dict:
+            if cache is not None:
+                cached = cache.get_fresh(key)
+                CACHE_LOOKUPS.inc(cache="group", result="miss" if cached is None else "hit")
+                if cached is not None:
+                    return cached
+            responses = self.client.group_responses(city_ids, units=units)
+            response = {"cnt": len(responses), "list": responses}
+            if cache is not None:
+                cache.put(key, response)
+            return response
+
+        return self.flights.do(key, fetch)
+
+    def stats(self) -> dict:
+        return {"flights": self.flights.executions, "coalesced": self.flights.shared,
+                "upstream_latency": self.client.transport.latency_stats(),
+                "budget": self.client.transport.scheduler.usage()}
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    '''
+    Routes:
+      /data/2.5/weather?q=...  OpenWeatherMap-compatible JSON (appid is ignored, units is honoured)
+      /data/2.5/forecast?q=... OpenWeatherMap-compatible 5 day forecast
+      /data/2.5/group?id=...   OpenWeatherMap-compatible current conditions for comma separated city IDs
+      /snapshot?q=...          Normalised WeatherSnapshot JSON
+      /health                  Cache statistics
+      /metrics                 Prometheus text format (weather.metrics)
+    '''
+    proxy = None  # set by serve()
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        query = params.get("q", [""])[0].strip()
+        units = params.get("units", [DEFAULT_UNITS])[0]
+
+        if url.path == "/health":
+            return self.send_json(200, self.proxy.stats())
+        if url.path == "/metrics":
+            return self.send_text(200, REGISTRY.render(), "text/plain; version=0.0.4; charset=utf-8")
+        if url.path == "/data/2.5/group":
+            return self.send_group(params.get("id", [""])[0], units)
+        if url.path not in ("/data/2.5/weather", "/data/2.5/forecast", "/snapshot"):
+            return self.send_json(404, {"cod": "404", "message": "unknown endpoint"})
+        if not query:
+            return self.send_json(400, {"cod": "400", "message": "missing q parameter"})
+        if units not in UNIT_SYSTEMS:
+            return self.send_json(400, {"cod": "400", "message": f"unknown units {units}"})
+
+        try:
+            if url.path == "/data/2.5/forecast":
+                response = self.proxy.forecast_response(query, units)
+            else:
+                response = self.proxy.current_response(query, units)
+            if url.path == "/snapshot":
+                response = WeatherSnapshot.from_response(response, query, units=units).to_dict()
+        except TransportError as exc:
+            status = exc.status_code or 502
+            return self.send_json(status, {"cod": str(status), "message": str(exc)})
+        except (ValueError, KeyError, TypeError) as exc:
+            return self.send_bad_upstream(exc)
+        self.send_json(200, response)
+
+    def send_group(self, ids: str, units: str) -> None:
+        try:
+            city_ids = [int(city_id) for city_id in ids.split(",") if city_id.strip()]
+        except ValueError:
+            return self.send_json(400, {"cod": "400", "message": f"invalid id parameter {ids}"})
+        if not city_ids:
+            return self.send_json(400, {"cod": "400", "message": "missing id parameter"})
+        if units not in UNIT_SYSTEMS:
+            return self.send_json(400, {"cod": "400", "message": f"unknown units {units}"})
+        try:
+            response = self.proxy.group_response(city_ids, units)
+        except TransportError as exc:
+            status = exc.status_code or 502
+            return self.send_json(status, {"cod": str(status), "message": str(exc)})
+        except (ValueError, KeyError, TypeError) as exc:
+            return self.send_bad_upstream(exc)
+        self.send_json(200, response)
+
+    def send_bad_upstream(self, exc: Exception) -> None:
+        # Non-JSON body (ValueError) or a document missing the expected fields
+        message = f"invalid upstream response: {exc.__class__.__name__}: {exc}"
+        self.send_json(502, {"cod": "502", "message": message})
+
+    def send_json(self, status: int, body) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_text(self, status: int, text: str, content_type: str) -> None:
+        data = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def serve(host: str = "127.0.0.1", port: int = 8080, ttl: float = 600, cache_path: str = ":memory:",
+          client: WeatherClient = None) -> ThreadingHTTPServer:
+    '''
+    Create the proxy server; call serve_forever() on the result to run it.
+    :param host: Interface to bind.
+    :param port: TCP port, 0 picks a free one.
+    :param ttl: Seconds a cached response is served before refetching.
+    :param cache_path: SQLite file shared between restarts, in memory by default.
+    :param client: Upstream client, created from the environment when omitted.
+    :return: ThreadingHTTPServer
+    '''
+    if client is None:
+        client = WeatherClient(cache=WeatherCache(path=cache_path, ttl=ttl))
+    handler = type("BoundProxyHandler", (ProxyHandler,), {"proxy": WeatherProxy(client)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+
+class TokenBucket:
+    '''
+    Thread-safe token bucket.
+
+    Tokens are added continuously at rate per second up to capacity; each
+    request spends one. With rate=1 and capacity=1 this enforces Nominatim's
+    one request per second policy.
+    '''
+    def __init__(self, rate: float, capacity: float = 1) -> None:
+        '''
+        :param rate: Tokens added per second.
+        :param capacity: Largest number of tokens that can accumulate (burst size).
+        :return: None
+        '''
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1, reserve: float = 0) -> bool:
+        '''
+        Spend tokens if they are available, without waiting.
+        :param tokens: Number of tokens to spend.
+        :param reserve: Tokens that must remain afterwards (kept for more important callers).
+        :return: True if the tokens were spent.
+        '''
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens + reserve:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def drain(self, seconds: float) -> None:
+        '''
+        Empty the bucket so the next token only appears after a pause,
+        e.g. when the server answered 429 with Retry-After.
+        :param seconds: Length of the pause.
+        :return: None
+        '''
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    def available(self) -> float:
+        '''
+        Tokens that could be spent right now.
+        :return: float
+        '''
+        with self._lock:
+            self._refill()
+            return max(0.0, self.tokens)
+
+    def delay(self, tokens: float = 1) -> float:
+        '''
+        Seconds until enough tokens will be available.
+        :param tokens: Number of tokens wanted.
+        :return: 0 when they are available now.
+        '''
+        with self._lock:
+            self._refill()
+            return max(0.0, (tokens - self.tokens) / self.rate)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import time
+
+
+class RefreshPolicy:
+    '''
+    Decide when to fetch a location again.
+
+    OpenWeatherMap publishes a new observation roughly every update_interval
+    seconds; the response's dt field says when the current one was taken.
+    Polling just after the next one is due avoids fetching the same data
+    twice. Stations that report late are polled about once per interval,
+    backing off while polls keep returning the same observation. Hidden or
+    idle windows poll less often.
+    '''
+    def __init__(self, update_interval: float = 600, grace: float = 60, min_delay: float = 60,
+                 max_delay: float = 3600, hidden_factor: float = 4, idle_after: float = 900,
+                 idle_factor: float = 2) -> None:
+        '''
+        :param update_interval: Expected seconds between provider observations.
+        :param grace: Seconds to wait past the expected update before polling.
+        :param min_delay: Shortest delay between polls.
+        :param max_delay: Longest delay between polls.
+        :param hidden_factor: Delay multiplier while the window is minimised or hidden.
+        :param idle_after: Seconds without user input after which the user counts as idle.
+        :param idle_factor: Delay multiplier while the user is idle.
+        :return: None
+        '''
+        self.update_interval = update_interval
+        self.grace = grace
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.hidden_factor = hidden_factor
+        self.idle_after = idle_after
+        self.idle_factor = idle_factor
+
+    def due_at(self, observed_at: float) -> float:
+        '''
+        :param observed_at: Unix time of the current observation (the response's dt).
+        :return: Unix time after which a newer observation should be available.
+        '''
+        return observed_at + self.update_interval + self.grace
+
+    def is_stale(self, observed_at: float, now: float = None) -> bool:
+        '''
+        :param observed_at: Unix time of the current observation.
+        :param now: Current Unix time, defaults to time.time().
+        :return: True once a newer observation should be available.
+        '''
+        return (time.time() if now is None else now) >= self.due_at(observed_at)
+
+    def next_delay(self, observed_at: float, visible: bool = True, idle_seconds: float = 0,
+                   now: float = None, unchanged: int = 0) -> float:
+        '''
+        Seconds to wait before the next fetch.
+        :param observed_at: Unix time of the current observation.
+        :param visible: False while the window is minimised or hidden.
+        :param idle_seconds: Seconds since the last user input.
+        :param now: Current Unix time, defaults to time.time().
+        :param unchanged: Polls in a row that returned this same observation.
+        :return: Delay in seconds.
+        '''
+        now = time.time() if now is None else now
+        wait = self.due_at(observed_at) - now
+        if wait > 0:
+            delay = max(self.min_delay, wait)
+        elif unchanged:
+            # Overdue and the last poll brought nothing new: back off up to one interval
+            delay = min(self.update_interval, self.min_delay * 2 ** (unchanged - 1))
+        else:
+            # New but already overdue: the station reports late, the next one follows about an interval on
+            delay = self.update_interval
+        if not visible:
+            delay = max(delay, self.update_interval) * self.hidden_factor
+        elif idle_seconds >= self.idle_after:
+            delay = max(delay, self.update_interval) * self.idle_factor
+        return min(delay, self.max_delay)
+
+    def retry_delay(self, failures: int) -> float:
+        '''
+        Delay after consecutive failed fetches, doubling each time.
+        :param failures: Number of failures in a row (at least 1).
+        :return: Delay in seconds.
+        '''
+        return min(self.max_delay, self.min_delay * 2 ** max(0, failures - 1))
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+import time
+
+from .ratelimit import TokenBucket
+
+# Priority classes, lower is served first
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# provider -> (tokens per second, burst)
+DEFAULT_LIMITS = {
+    "owm": (60 / 60.0, 10),        # OpenWeatherMap free tier: 60 calls/minute
+    "nominatim": (1.0, 1),         # Nominatim usage policy: 1 request/second
+}
+
+# Share of each bucket background traffic may not touch
+BACKGROUND_RESERVE = 0.2
+
+
+class QuotaExceeded(Exception):
+    '''
+    Raised when a request could not get a token within its timeout.
+    Callers should fall back to cached data.
+    '''
+
+
+class RequestScheduler:
+    '''
+    Per-provider token buckets shared by every outgoing API call in the process.
+
+    acquire() blocks until the provider has budget. Interactive callers are
+    served before background ones, and background callers leave part of the
+    bucket untouched so a user action never waits behind a batch refresh.
+    '''
+    def __init__(self, limits: dict = None) -> None:
+        '''
+        :param limits: dict of provider -> (tokens per second, burst); defaults to DEFAULT_LIMITS.
+        :return: None
+        '''
+        self.buckets = {name: TokenBucket(rate, burst) for name, (rate, burst) in (limits or DEFAULT_LIMITS).items()}
+        self._condition = threading.Condition()
+        self._waiting = {name: [0, 0] for name in self.buckets}
+        self._granted = {name: [0, 0] for name in self.buckets}
+        self._rejected = {name: [0, 0] for name in self.buckets}
+        self._waited = {name: 0.0 for name in self.buckets}
+
+    def acquire(self, provider: str, priority: int = INTERACTIVE, timeout: float = None) -> None:
+        '''
+        Wait for permission to send one request.
+        Unknown providers are not limited.
+        :param provider: Key into the limits, e.g. "owm" or "nominatim".
+        :param priority: INTERACTIVE or BACKGROUND.
+        :param timeout: Longest wait in seconds, None waits indefinitely.
+        :return: None
+        '''
+        bucket = self.buckets.get(provider)
+        if bucket is None:
+            return
+        reserve = self.reserve(bucket) if priority == BACKGROUND else 0
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+
+        with self._condition:
+            waiting = self._waiting[provider]
+            waiting[priority] += 1
+            try:
+                while True:
+                    higher_waiting = any(waiting[:priority])
+                    if not higher_waiting and bucket.try_acquire(1, reserve):
+                        self._granted[provider][priority] += 1
+                        self._waited[provider] += time.monotonic() - start
+                        self._condition.notify_all()
+                        return
+                    pause = max(bucket.delay(1 + reserve), 0.01)
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._rejected[provider][priority] += 1
+                            raise QuotaExceeded(f"{provider} request budget exhausted")
+                        pause = min(pause, remaining)
+                    self._condition.wait(pause)
+            finally:
+                waiting[priority] -= 1
+
+    @staticmethod
+    def reserve(bucket) -> float:
+        '''
+        Tokens background requests leave untouched in a bucket. Capped so one
+        request still fits: a burst-1 bucket such as Nominatim's keeps no reserve.
+        :param bucket: TokenBucket
+        :return: float
+        '''
+        return max(0.0, min(bucket.capacity * BACKGROUND_RESERVE, bucket.capacity - 1))
+
+    def delay(self, provider: str) -> float:
+        '''
+        Seconds until an interactive request to provider could be sent.
+        :param provider: Provider name.
+        :return: 0 when budget is available now.
+        '''
+        bucket = self.buckets.get(provider)
+        return bucket.delay() if bucket is not None else 0.0
+
+    def throttle(self, provider: str, seconds: float) -> None:
+        '''
+        Pause a provider after it signalled rate limiting (HTTP 429).
+        :param provider: Provider name.
+        :param seconds: Pause length.
+        :return: None
+        '''
+        bucket = self.buckets.get(provider)
+        if bucket is not None:
+            bucket.drain(seconds)
+
+    def usage(self) -> dict:
+        '''
+        Current budget and counters per provider.
+        :param: None
+        :return: dict of provider -> stats.
+        '''
+        stats = {}
+        with self._condition:
+            for name, bucket in self.buckets.items():
+                stats[name] = {
+                    "rate_per_minute": bucket.rate * 60,
+                    "burst": bucket.capacity,
+                    "available": bucket.available(),
+                    "waiting": dict(zip(PRIORITY_NAMES.values(), self._waiting[name])),
+                    "granted": dict(zip(PRIORITY_NAMES.values(), self._granted[name])),
+                    "rejected": dict(zip(PRIORITY_NAMES.values(), self._rejected[name])),
+                    "wait_seconds": self._waited[name],
+                }
+        return stats
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler() -> RequestScheduler:
+    '''
+    The process-wide scheduler. WEATHER_OWM_PER_MINUTE overrides the OpenWeatherMap budget.
+    :param: None
+    :return: RequestScheduler
+    '''
+    global _default
+    with _default_lock:
+        if _default is None:
+            limits = dict(DEFAULT_LIMITS)
+            per_minute = os.environ.get("WEATHER_OWM_PER_MINUTE")
+            if per_minute:
+                limits["owm"] = (float(per_minute) / 60.0, max(1, min(float(per_minute) / 6, 100)))
+            _default = RequestScheduler(limits)
+        return _default
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+import heapq
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_unit_vector(lat: float, lon: float) -> tuple:
+    '''
+    Convert latitude/longitude in degrees to a point on the unit sphere.
+    Straight-line (chord) distance between such points grows monotonically
+    with great-circle distance, so a Euclidean k-d tree answers geographic queries.
+    '''
+    phi, lam = math.radians(lat), math.radians(lon)
+    cos_phi = math.cos(phi)
+    return (cos_phi * math.cos(lam), cos_phi * math.sin(lam), math.sin(phi))
+
+
+def chord_to_km(chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def km_to_chord(km: float) -> float:
+    return 2 * math.sin(min(math.pi, km / EARTH_RADIUS_KM) / 2)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    '''
+    Great-circle distance between two points in kilometres.
+    '''
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SpatialIndex:
+    '''
+    Static k-d tree over points on the globe.
+
+    The tree is stored implicitly: for every sub-range of self.points the
+    median along the splitting axis sits in the middle, so no node objects
+    are allocated. Nearest-neighbour and radius queries take O(log n) on
+    average.
+    '''
+    def __init__(self, entries) -> None:
+        '''
+        :param entries: Iterable of (lat, lon, item); item is returned by queries.
+        :return: None
+        '''
+        self.points = [(to_unit_vector(lat, lon), item) for lat, lon, item in entries]
+        self._build(0, len(self.points), 0)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _build(self, low: int, high: int, axis: int) -> None:
+        stack = [(low, high, axis)]
+        while stack:
+            low, high, axis = stack.pop()
+            if high - low <= 1:
+                continue
+            self.points[low:high] = sorted(self.points[low:high], key=lambda p: p[0][axis])
+            middle = (low + high) // 2
+            next_axis = (axis + 1) % 3
+            stack.append((low, middle, next_axis))
+            stack.append((middle + 1, high, next_axis))
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> list:
+        '''
+        The k items closest to a point.
+        :param lat: Latitude in degrees.
+        :param lon: Longitude in degrees.
+        :param k: Number of items wanted.
+        :return: List of (distance_km, item), nearest first.
+        '''
+        if k < 1:
+            return []
+        target = to_unit_vector(lat, lon)
+        best = []  # max-heap of (-squared distance, counter, item)
+        counter = 0
+        stack = [(0, len(self.points), 0)]
+        while stack:
+            low, high, axis = stack.pop()
+            if low >= high:
+                continue
+            middle = (low + high) // 2
+            point, item = self.points[middle]
+            squared = sum((a - b) ** 2 for a, b in zip(point, target))
+            counter += 1
+            if len(best) < k:
+                heapq.heappush(best, (-squared, counter, item))
+            elif squared < -best[0][0]:
+                heapq.heapreplace(best, (-squared, counter, item))
+
+            delta = target[axis] - point[axis]
+            near, far = ((low, middle), (middle + 1, high)) if delta < 0 else ((middle + 1, high), (low, middle))
+            next_axis = (axis + 1) % 3
+            # Visit the far side only if the splitting plane is closer than the current worst match
+            if len(best) < k or delta * delta < -best[0][0]:
+                stack.append((far[0], far[1], next_axis))
+            stack.append((near[0], near[1], next_axis))
+
+        return [(chord_to_km(math.sqrt(-squared)), item) for squared, _, item in sorted(best, reverse=True)]
+
+    def within(self, lat: float, lon: float, radius_km: float) -> list:
+        '''
+        All items within a great-circle radius of a point.
+        :param lat: Latitude in degrees.
+        :param lon: Longitude in degrees.
+        :param radius_km: Search radius in kilometres.
+        :return: List of (distance_km, item), nearest first.
+        '''
+        target = to_unit_vector(lat, lon)
+        limit = km_to_chord(radius_km) ** 2
+        found = []
+        stack = [(0, len(self.points), 0)]
+        while stack:
+            low, high, axis = stack.pop()
+            if low >= high:
+                continue
+            middle = (low + high) // 2
+            point, item = self.points[middle]
+            squared = sum((a - b) ** 2 for a, b in zip(point, target))
+            if squared <= limit:
+                found.append((chord_to_km(math.sqrt(squared)), item))
+
+            delta = target[axis] - point[axis]
+            next_axis = (axis + 1) % 3
+            if delta < 0 or delta * delta <= limit:
+                stack.append((low, middle, next_axis))
+            if delta >= 0 or delta * delta <= limit:
+                stack.append((middle + 1, high, next_axis))
+
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+
+class ReverseGeocoder:
+    '''
+    Offline reverse geocoding against the gazetteer's places.
+    '''
+    def __init__(self, places) -> None:
+        '''
+        :param places: Iterable of gazetteer.Place, e.g. Gazetteer.places().
+        :return: None
+        '''
+        self.index = SpatialIndex((place.lat, place.lon, place) for place in places)
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> list:
+        '''
+        :return: List of (distance_km, Place), nearest first.
+        '''
+        return self.index.nearest(lat, lon, k)
+
+    def within(self, lat: float, lon: float, radius_km: float) -> list:
+        '''
+        :return: List of (distance_km, Place) within radius_km, nearest first.
+        '''
+        return self.index.within(lat, lon, radius_km)
+
+    def locate(self, lat: float, lon: float, radius_km: float = 10.0):
+        '''
+        The place a point belongs to: the most populous place within radius_km,
+        so suburbs and villages do not shadow the city around them.
+        :return: Place, or None when nothing is that close.
+        '''
+        places = self.index.within(lat, lon, radius_km)
+        if not places:
+            return None
+        return max(places, key=lambda pair: (pair[1].population, -pair[0]))[1]
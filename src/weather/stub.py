@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+'''
+Local stand-in for the OpenWeatherMap and Nominatim APIs.
+
+Responses come from recorded fixtures; a request without a fixture gets a
+deterministic synthesized response, so any city list can be load-tested.
+Latency, server errors and 429 rate limiting can be injected. In record
+mode requests are forwarded to the real services once and successful responses
+saved as fixtures. Point the app at the stub with
+WEATHER_API_URL=http://host:port/data/2.5 and WEATHER_NOMINATIM_URL=http://host:port.
+'''
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from .cache import normalize_key
+from .core import OWM_BASE_URL
+from .units import DEFAULT_UNITS, convert_speed, from_kelvin
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org"
+
+# Parameters that do not change a response and are left out of fixture keys
+IGNORED_PARAMS = frozenset({"appid", "format", "accept-language", "addressdetails"})
+
+ROUTES = {
+    "/data/2.5/weather": "weather",
+    "/data/2.5/forecast": "forecast",
+    "/data/2.5/group": "group",
+    "/search": "search",
+}
+
+
+def fixture_key(endpoint: str, params: dict) -> str:
+    '''
+    Identity of a request for fixture lookup.
+    :param endpoint: Route name, e.g. "weather".
+    :param params: Query parameters.
+    :return: str
+    '''
+    kept = sorted((name, normalize_key(value) if name == "q" else value)
+                  for name, value in params.items() if name not in IGNORED_PARAMS)
+    return endpoint + "?" + "&".join(f"{name}={value}" for name, value in kept)
+
+
+class FixtureStore:
+    '''
+    Recorded responses, one JSON file per request under a directory.
+    '''
+    def __init__(self, directory: str) -> None:
+        '''
+        :param directory: Fixture folder; created when recording.
+        :return: None
+        '''
+        self.directory = directory
+        self.fixtures = {}
+        self._lock = threading.Lock()
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith(".json"):
+                    with open(os.path.join(directory, name), encoding="utf-8") as handle:
+                        fixture = json.load(handle)
+                    self.fixtures[fixture["key"]] = fixture
+
+    def get(self, key: str):
+        '''
+        :param key: fixture_key() of the request.
+        :return: dict with status and body, or None.
+        '''
+        return self.fixtures.get(key)
+
+    def save(self, key: str, status: int, body) -> None:
+        '''
+        Keep a response in memory and on disk.
+        :param key: fixture_key() of the request.
+        :param status: HTTP status.
+        :param body: Decoded JSON body.
+        :return: None
+        '''
+        fixture = {"key": key, "status": status, "body": body}
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16] + ".json"
+        with self._lock:
+            self.fixtures[key] = fixture
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, name), "w", encoding="utf-8") as handle:
+                json.dump(fixture, handle, indent=1)
+
+
+def synthesize(endpoint: str, params: dict, now: float = None):
+    '''
+    Plausible, repeatable response for a request without a fixture.
+    Values derive from a hash of the city so every run sees the same data.
+    :param endpoint: Route name.
+    :param params: Query parameters.
+    :param now: Observation time, defaults to the current time.
+    :return: (status, body)
+    '''
+    now = int(time.time() if now is None else now)
+    units = params.get("units", DEFAULT_UNITS)
+    if endpoint == "search":
+        query = params.get("q", "").strip()
+        seed = zlib.crc32(normalize_key(query).encode("utf-8"))
+        return 200, [{"place_id": seed, "display_name": query.title(), "lat": str(seed % 180 - 90 + 0.5),
+                      "lon": str(seed % 360 - 180 + 0.5), "type": "city", "importance": 0.5}] if query else []
+    if endpoint == "group":
+        ids = [int(city_id) for city_id in params.get("id", "").split(",") if city_id.strip().isdigit()]
+        items = [synthetic_observation(f"City {city_id}", city_id, now, units) for city_id in ids]
+        return 200, {"cnt": len(items), "list": items}
+
+    query = params.get("q", "").strip()
+    if not query:
+        return 400, {"cod": "400", "message": "Nothing to geocode"}
+    city_id = zlib.crc32(normalize_key(query).encode("utf-8")) % 9000000 + 1000000
+    name = query.split(",")[0].strip().title()
+    observation = synthetic_observation(name, city_id, now, units)
+    if endpoint == "weather":
+        return 200, observation
+    first = now - now % 10800 + 10800
+    steps = []
+    for step in range(40):
+        item = synthetic_observation(name, city_id, first + step * 10800, units)
+        steps.append({"dt": item["dt"], "main": item["main"], "weather": item["weather"], "wind": item["wind"],
+                      "pop": round((city_id + step) % 10 / 10, 1)})
+    city = {"id": city_id, "name": name, "coord": observation["coord"], "country": "ZZ",
+            "timezone": observation["timezone"]}
+    return 200, {"cod": "200", "cnt": len(steps), "list": steps, "city": city}
+
+
+def synthetic_observation(name: str, city_id: int, when: int, units: str = DEFAULT_UNITS) -> dict:
+    '''
+    /weather-shaped observation for a city at a time.
+    :param name: City name.
+    :param city_id: City ID, also the seed.
+    :param when: Unix time of the observation.
+    :param units: Unit system of the values.
+    :return: dict
+    '''
+    hour = when % 86400 / 3600
+    temp = 275 + city_id % 30 + 6 * (1 - abs(hour - 14) / 12)
+    speed = 1 + city_id % 9
+    icons = [("clear sky", "01"), ("few clouds", "02"), ("light rain", "10"), ("mist", "50")]
+    condition, icon = icons[city_id % len(icons)]
+    temps = {field: round(from_kelvin(value, units), 2) for field, value in
+             (("temp", temp), ("feels_like", temp - 1.5), ("temp_min", temp - 2), ("temp_max", temp + 2))}
+    return {
+        "coord": {"lon": city_id % 360 - 180 + 0.5, "lat": city_id % 180 - 90 + 0.5},
+        "weather": [{"id": 800, "main": condition.title(), "description": condition,
+                     "icon": icon + ("d" if 6 <= hour < 18 else "n")}],
+        "main": dict(temps, pressure=1000 + city_id % 30, humidity=40 + city_id % 50),
+        "wind": {"speed": round(convert_speed(speed, DEFAULT_UNITS, units), 2),
+                 "deg": city_id % 360},
+        "dt": int(when),
+        "sys": {"country": "ZZ", "sunrise": int(when - when % 86400 + 6 * 3600),
+                "sunset": int(when - when % 86400 + 18 * 3600)},
+        "timezone": 0,
+        "id": city_id,
+        "name": name,
+        "cod": 200,
+    }
+
+
+class Faults:
+    '''
+    Injected latency and failures.
+    '''
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, retry_after: float = 1.0, seed: int = None) -> None:
+        '''
+        :param latency: Seconds added to every response.
+        :param jitter: Up to this many extra seconds, uniformly distributed.
+        :param error_rate: Share of requests answered with 503.
+        :param rate_limit_rate: Share of requests answered with 429 and Retry-After.
+        :param retry_after: Retry-After value in seconds.
+        :param seed: Random seed for repeatable runs.
+        :return: None
+        '''
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        '''
+        Decide the fate of one request.
+        :return: (delay in seconds, injected status or None)
+        '''
+        with self._lock:
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+            roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            return delay, 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return delay, 503
+        return delay, None
+
+
+class StubServer:
+    '''
+    Request handling shared by all handler threads: fixtures, faults, recording and counters.
+    '''
+    def __init__(self, fixtures: FixtureStore, faults: Faults = None, record: bool = False,
+                 owm_url: str = OWM_BASE_URL, nominatim_url: str = NOMINATIM_URL) -> None:
+        '''
+        :param fixtures: Recorded responses.
+        :param faults: Injected latency and failures, none by default.
+        :param record: Forward requests without a fixture upstream and save the 2xx responses.
+        :param owm_url: Upstream OpenWeatherMap root used in record mode.
+        :param nominatim_url: Upstream Nominatim root used in record mode.
+        :return: None
+        '''
+        self.fixtures = fixtures
+        self.faults = faults or Faults()
+        self.record = record
+        self.owm_url = owm_url.rstrip("/")
+        self.nominatim_url = nominatim_url.rstrip("/")
+        self.counts = {"fixture": 0, "synthesized": 0, "recorded": 0, "passed_through": 0,
+                       "upstream_failed": 0, "injected_429": 0, "injected_503": 0}
+        self._lock = threading.Lock()
+        self._session = None
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+    def respond(self, endpoint: str, params: dict):
+        '''
+        Produce the response to one request.
+        :param endpoint: Route name.
+        :param params: Query parameters.
+        :return: (status, body, extra headers)
+        '''
+        delay, injected = self.faults.draw()
+        if delay:
+            time.sleep(delay)
+        if injected == 429:
+            self.count("injected_429")
+            return 429, {"cod": 429, "message": "Injected rate limit"}, {"Retry-After": f"{self.faults.retry_after:g}"}
+        if injected == 503:
+            self.count("injected_503")
+            return 503, {"cod": 503, "message": "Injected server error"}, {}
+
+        key = fixture_key(endpoint, params)
+        fixture = self.fixtures.get(key)
+        if fixture is not None:
+            self.count("fixture")
+            return fixture["status"], fixture["body"], {}
+        if self.record:
+            try:
+                status, body, headers = self.forward(endpoint, params)
+            except OSError as exc:  # requests.RequestException included
+                self.count("upstream_failed")
+                return 502, {"cod": 502, "message": f"Upstream request failed: {exc}"}, {}
+            if not 200 <= status < 300:
+                # Quota, auth and server errors are passed on but never replayed
+                self.count("passed_through")
+                return status, body, headers
+            self.fixtures.save(key, status, body)
+            self.count("recorded")
+            return status, body, {}
+        self.count("synthesized")
+        status, body = synthesize(endpoint, params)
+        return status, body, {}
+
+    def forward(self, endpoint: str, params: dict):
+        '''
+        Fetch a response from the real service (record mode).
+        :param endpoint: Route name.
+        :param params: Query parameters, including the caller's appid.
+        :return: (status, body, headers worth passing on)
+        '''
+        import requests
+        with self._lock:
+            if self._session is None:
+                self._session = requests.Session()
+            session = self._session
+        if endpoint == "search":
+            url = f"{self.nominatim_url}/search"
+            headers = {"User-Agent": "weather-cli stub recorder"}
+        else:
+            url = f"{self.owm_url}/{endpoint}"
+            headers = None
+        response = session.get(url, params=params, headers=headers, timeout=(3.05, 30))
+        try:
+            body = response.json()
+        except ValueError:
+            body = {"cod": response.status_code, "message": response.text[:200]}
+        headers = {"Retry-After": response.headers["Retry-After"]} if "Retry-After" in response.headers else {}
+        return response.status_code, body, headers
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counts, fixtures=len(self.fixtures.fixtures))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    '''
+    Routes:
+      /data/2.5/weather, /data/2.5/forecast, /data/2.5/group  OpenWeatherMap
+      /search                                                  Nominatim
+      /health                                                  Counters
+    '''
+    stub = None  # set by serve()
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            return self.send_json(200, self.stub.stats())
+        endpoint = ROUTES.get(url.path)
+        if endpoint is None:
+            return self.send_json(404, {"cod": "404", "message": "unknown endpoint"})
+        status, body, headers = self.stub.respond(endpoint, dict(parse_qsl(url.query)))
+        self.send_json(status, body, headers)
+
+    def send_json(self, status: int, body, headers: dict = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def serve(host: str = "127.0.0.1", port: int = 8089, fixtures_dir: str = None, faults: Faults = None,
+          record: bool = False) -> ThreadingHTTPServer:
+    '''
+    Create the stub server; call serve_forever() on the result to run it.
+    :param host: Interface to bind.
+    :param port: TCP port, 0 picks a free one.
+    :param fixtures_dir: Fixture folder, defaults to "fixtures" in the data directory.
+    :param faults: Injected latency and failures.
+    :param record: Record missing fixtures from the real services.
+    :return: ThreadingHTTPServer
+    '''
+    if fixtures_dir is None:
+        from .paths import data_path
+        fixtures_dir = data_path("fixtures")
+    stub = StubServer(FixtureStore(fixtures_dir), faults, record)
+    handler = type("BoundStubHandler", (StubHandler,), {"stub": stub})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+import glob
+import json
+import os
+import time
+from typing import NamedTuple
+
+from .paths import data_path
+
+# A theme switch should complete within one frame at 60 Hz
+SWITCH_BUDGET_MS = 16.0
+
+STYLESHEET_TEMPLATE = (
+    "QWidget {{ background-color: {background}; color: {foreground}; }}\n"
+    "QMenu::item:selected, QListView::item:selected {{ background-color: {accent}; }}\n"
+    "QLabel#time_label {{ background-color: transparent; color: {accent}; font-weight: bold; }}\n"
+    "QLabel#label_icon {{ color: {accent}; }}\n"
+)
+
+
+class Theme(NamedTuple):
+    '''
+    Colours of one theme, as Qt stylesheet colour strings.
+    '''
+    name: str
+    background: str
+    foreground: str
+    accent: str
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Theme":
+        '''
+        Build a theme from a user theme file.
+        :param data: dict with name, background, foreground and optionally accent.
+        :return: Theme
+        '''
+        return cls(str(data["name"]), str(data["background"]), str(data["foreground"]),
+                   str(data.get("accent", data["foreground"])))
+
+    def stylesheet(self) -> str:
+        '''
+        The application-wide stylesheet for this theme.
+        :return: str
+        '''
+        return STYLESHEET_TEMPLATE.format(**self._asdict())
+
+
+BUILTIN_THEMES = [
+    Theme("Dark", "rgba(36, 31, 49, 120)", "rgb(246, 245, 244)", "rgb(222, 221, 218)"),
+    Theme("Light", "rgba(245, 245, 245, 0.8)", "rgba(50, 50, 50, 1)", "rgba(50, 50, 50, 1)"),
+]
+
+
+class ThemeManager:
+    '''
+    Switch themes with a single application-wide stylesheet.
+
+    Setting a stylesheet on every widget re-polishes each one separately and
+    grows with the widget count; one QApplication stylesheet is applied in a
+    single pass and new widgets pick it up when they are created. Stylesheets
+    are compiled once, when the themes are loaded. User themes are JSON files
+    in the "themes" folder of the data directory, for example
+    {"name": "Ocean", "background": "rgba(10, 40, 70, 150)", "foreground": "white"}.
+    '''
+    def __init__(self, app, directory: str = None, load_user: bool = True) -> None:
+        '''
+        :param app: The QApplication to style.
+        :param directory: Folder of user theme files, defaults to <data dir>/themes.
+        :param load_user: False to leave reading the folder to a later load_user_themes() call.
+        :return: None
+        '''
+        self.app = app
+        self.directory = directory or data_path("themes")
+        self.themes = {}
+        self.stylesheets = {}
+        self.errors = []
+        self.current = None
+        self.last_switch_ms = 0.0
+        for theme in BUILTIN_THEMES:
+            self.register(theme)
+        if load_user:
+            self.load_user_themes()
+
+    def register(self, theme: Theme) -> None:
+        '''
+        Add or replace a theme and compile its stylesheet.
+        :param theme: The theme.
+        :return: None
+        '''
+        self.themes[theme.name] = theme
+        self.stylesheets[theme.name] = theme.stylesheet()
+
+    def load_user_themes(self) -> None:
+        '''
+        Register every readable *.json theme in the user theme folder.
+        Unreadable files are listed in self.errors and skipped.
+        :param: None
+        :return: None
+        '''
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.json"))):
+            try:
+                with open(path, encoding="utf-8") as handle:
+                    self.register(Theme.from_dict(json.load(handle)))
+            except (OSError, ValueError, KeyError, TypeError) as exc:
+                self.errors.append(f"{os.path.basename(path)}: {exc}")
+
+    def names(self) -> list:
+        '''
+        Theme names, built-in themes first.
+        :return: list of str
+        '''
+        return list(self.themes)
+
+    def apply(self, name: str) -> float:
+        '''
+        Make a theme current.
+        :param name: Theme name; unknown names fall back to the first built-in theme.
+        :return: Milliseconds the switch took.
+        '''
+        if name not in self.stylesheets:
+            name = BUILTIN_THEMES[0].name
+        start = time.perf_counter()
+        self.app.setStyleSheet(self.stylesheets[name])
+        self.last_switch_ms = (time.perf_counter() - start) * 1000
+        self.current = name
+        return self.last_switch_ms
+
+    def within_budget(self) -> bool:
+        '''
+        True when the last switch met SWITCH_BUDGET_MS.
+        :return: bool
+        '''
+        return self.last_switch_ms <= SWITCH_BUDGET_MS
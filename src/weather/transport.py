@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+from .metrics import HTTP_SECONDS, log_event, observe_stage
+from .scheduler import INTERACTIVE, default_scheduler
+
+if TYPE_CHECKING:
+    import requests
+
+# Responses worth retrying: rate limiting and transient upstream failures
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class TransportError(Exception):
+    '''
+    Raised when a request cannot be completed.
+    status_code is None for network failures, otherwise the final HTTP status.
+    '''
+    def __init__(self, message: str, status_code: int = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Transport:
+    '''
+    Shared HTTP layer for all outgoing API calls.
+
+    Keeps one requests.Session so TCP/TLS connections are reused between
+    fetches, bounds every request with connect/read timeouts and retries
+    429/5xx responses with jittered exponential backoff. requests is imported
+    when the session is first needed, usually on a worker thread, so creating
+    a Transport does not delay the first window paint.
+    '''
+    def __init__(self, connect_timeout: float = 3.05, read_timeout: float = 10.0,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_cap: float = 8.0,
+                 pool_size: int = 10, history: int = 256, scheduler=None) -> None:
+        '''
+        :param connect_timeout: Seconds to wait for a connection to be established.
+        :param read_timeout: Seconds to wait between bytes of the response.
+        :param max_retries: Extra attempts after the first one fails with a retryable error.
+        :param backoff_base: Upper bound in seconds of the first backoff delay.
+        :param backoff_cap: Largest backoff delay in seconds.
+        :param pool_size: Connections kept alive per host.
+        :param history: Number of latency samples to keep.
+        :param scheduler: RequestScheduler that budgets calls, defaults to the shared one.
+        :return: None
+        '''
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.scheduler = scheduler or default_scheduler()
+        self.pool_size = pool_size
+        self._session = None
+
+        self.latencies = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        '''
+        The shared requests.Session, created on first use.
+        '''
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+
+    def get_json(self, url: str, params: dict = None, headers: dict = None, provider: str = None,
+                 priority: int = INTERACTIVE, budget_timeout: float = None):
+        '''
+        GET a URL and decode its JSON body, retrying transient failures.
+        Every attempt spends one token of the provider's budget; raises
+        scheduler.QuotaExceeded when none is granted within budget_timeout.
+        :param url: Endpoint without a query string.
+        :param params: Query parameters, encoded by requests.
+        :param headers: Extra request headers.
+        :param provider: Scheduler budget to charge, e.g. "owm"; None is unmetered.
+        :param priority: scheduler.INTERACTIVE or scheduler.BACKGROUND.
+        :param budget_timeout: Longest wait for budget in seconds, None waits indefinitely.
+        :return: The decoded JSON document.
+        '''
+        import requests
+        host = urlsplit(url).netloc
+        session = self.session
+        for attempt in range(self.max_retries + 1):
+            if provider is not None:
+                self.scheduler.acquire(provider, priority, budget_timeout)
+            opened = self.opened_connections(url)
+            start = time.perf_counter()
+            try:
+                response = session.get(url, params=params, headers=headers,
+                                       timeout=(self.connect_timeout, self.read_timeout))
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                self.record_latency(url, time.perf_counter() - start, None, "failed")
+                if attempt == self.max_retries:
+                    raise TransportError(f"Network error contacting {host}: {exc.__class__.__name__}") from exc
+                time.sleep(self.backoff_delay(attempt))
+                continue
+
+            seconds = time.perf_counter() - start
+            now_opened = self.opened_connections(url)
+            connection = "unknown" if opened is None else "new" if now_opened > opened else "reused"
+            self.record_latency(url, seconds, response.status_code, connection)
+            headers_seconds = min(response.elapsed.total_seconds(), seconds)
+            observe_stage("http_headers", headers_seconds, connection=connection)
+            observe_stage("http_body", seconds - headers_seconds, bytes=len(response.content))
+            if response.status_code == 200:
+                decode_start = time.perf_counter()
+                document = response.json()
+                observe_stage("json_decode", time.perf_counter() - decode_start)
+                return document
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                delay = self.backoff_delay(attempt, response.headers.get("Retry-After"))
+                if response.status_code == 429 and provider is not None:
+                    self.scheduler.throttle(provider, delay)  # Hold back every caller, not just this one
+                time.sleep(delay)
+                continue
+
+            raise TransportError(self.describe_error(response, host), response.status_code)
+
+    def backoff_delay(self, attempt: int, retry_after: str = None) -> float:
+        '''
+        Compute how long to sleep before the next attempt ("full jitter" backoff).
+        :param attempt: Zero-based number of the attempt that just failed.
+        :param retry_after: Value of a Retry-After header, honoured when numeric.
+        :return: Delay in seconds.
+        '''
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        if retry_after:
+            try:
+                delay = max(delay, min(self.backoff_cap, float(retry_after)))
+            except ValueError:
+                pass
+        return delay
+
+    def describe_error(self, response: "requests.Response", host: str) -> str:
+        '''
+        Build an error message without echoing the query string (it carries the API key).
+        :param response: The failed response.
+        :param host: Host the request was sent to.
+        :return: A human readable message.
+        '''
+        message = ""
+        try:
+            body = response.json()
+            if isinstance(body, dict):
+                message = str(body.get("message", ""))
+        except ValueError:
+            pass
+        return f"{host} returned {response.status_code}" + (f": {message}" if message else "")
+
+    def opened_connections(self, url: str):
+        '''
+        Connections the adapter for a URL has opened so far. It grows when a
+        request pays for DNS, TCP and TLS setup instead of reusing a connection.
+        :param url: Endpoint.
+        :return: int, or None for adapters without a urllib3 pool manager.
+        '''
+        try:
+            pools = self.session.get_adapter(url).poolmanager.pools
+            return sum(pools[key].num_connections for key in pools.keys())
+        except (AttributeError, KeyError):
+            return None
+
+    def record_latency(self, url: str, seconds: float, status_code: int, connection: str = "unknown") -> None:
+        '''
+        Remember the duration of one attempt.
+        :param url: Endpoint that was called (without query string).
+        :param seconds: Wall-clock duration of the attempt.
+        :param status_code: HTTP status, or None when no response arrived.
+        :param connection: "new", "reused", "failed" or "unknown".
+        :return: None
+        '''
+        path = urlsplit(url).path
+        with self._lock:
+            self.latencies.append((path, seconds, status_code))
+        HTTP_SECONDS.observe(seconds, endpoint=path, status=status_code or "error", connection=connection)
+        log_event("http", logging.INFO if status_code != 200 else logging.DEBUG, endpoint=path,
+                  status=status_code, connection=connection, seconds=round(seconds, 6))
+
+    def latency_stats(self) -> dict:
+        '''
+        Summarise the recorded latencies.
+        :param: None
+        :return: dict with count, mean, p50, p95 and max in seconds.
+        '''
+        with self._lock:
+            samples = sorted(seconds for _, seconds, _ in self.latencies)
+        if not samples:
+            return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        return {
+            "count": len(samples),
+            "mean": sum(samples) / len(samples),
+            "p50": samples[len(samples) // 2],
+            "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            "max": samples[-1],
+        }
+
+    def close(self) -> None:
+        '''
+        Close pooled connections.
+        :param: None
+        :return: None
+        '''
+        if self._session is not None:
+            self._session.close()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+'''
+Unit systems of the OpenWeatherMap API and conversion between them.
+
+"standard" is Kelvin and m/s (the API default), "metric" is Celsius and
+m/s, "imperial" is Fahrenheit and mph. Every converter accepts a number or
+a NumPy array, so a snapshot, a forecast or years of history are converted
+with the same arithmetic in one pass. Requesting the API's units= parameter
+makes most conversions unnecessary; these functions cover data that was
+stored or fetched in another system.
+'''
+
+from typing import NamedTuple
+
+
+class UnitSystem(NamedTuple):
+    '''
+    Display labels of a unit system.
+    '''
+    name: str
+    temperature: str
+    speed: str
+
+
+UNIT_SYSTEMS = {
+    "standard": UnitSystem("standard", "K", "m/s"),
+    "metric": UnitSystem("metric", "C", "m/s"),
+    "imperial": UnitSystem("imperial", "F", "MPH"),
+}
+DEFAULT_UNITS = "standard"
+
+TEMPERATURE_FIELDS = ("temp", "feels_like", "temp_min", "temp_max")
+SPEED_FIELDS = ("wind_speed",)
+
+MPH_PER_MPS = 2.2369362920544
+
+
+def check_units(units: str) -> str:
+    '''
+    :param units: Unit system name.
+    :return: The name, when it is one of UNIT_SYSTEMS.
+    '''
+    if units not in UNIT_SYSTEMS:
+        raise ValueError(f"unknown units {units!r}, expected one of {', '.join(UNIT_SYSTEMS)}")
+    return units
+
+
+def to_kelvin(values, units: str):
+    '''
+    :param values: Temperatures in the given system (number or array).
+    :param units: Unit system of values.
+    :return: Temperatures in Kelvin.
+    '''
+    if units == "metric":
+        return values + 273.15
+    if units == "imperial":
+        return (values - 32) / 1.8 + 273.15
+    return values
+
+
+def from_kelvin(values, units: str):
+    '''
+    :param values: Temperatures in Kelvin (number or array).
+    :param units: Target unit system.
+    :return: Temperatures in the target system.
+    '''
+    if units == "metric":
+        return values - 273.15
+    if units == "imperial":
+        return (values - 273.15) * 1.8 + 32
+    return values
+
+
+def convert_temperature(values, from_units: str, to_units: str):
+    '''
+    :param values: Temperatures (number or array).
+    :param from_units: Unit system of values.
+    :param to_units: Target unit system.
+    :return: Converted temperatures; values itself when the systems match.
+    '''
+    if from_units == to_units:
+        return values
+    return from_kelvin(to_kelvin(values, from_units), to_units)
+
+
+def convert_speed(values, from_units: str, to_units: str):
+    '''
+    :param values: Wind speeds (number or array).
+    :param from_units: Unit system of values.
+    :param to_units: Target unit system.
+    :return: Converted speeds; values itself when both systems use the same unit.
+    '''
+    from_mph, to_mph = from_units == "imperial", to_units == "imperial"
+    if from_mph == to_mph:
+        return values
+    return values / MPH_PER_MPS if from_mph else values * MPH_PER_MPS
+
+
+def convert_snapshot(snapshot, to_units: str):
+    '''
+    Convert a WeatherSnapshot, all temperature fields in one array operation.
+    :param snapshot: weather.core.WeatherSnapshot
+    :param to_units: Target unit system.
+    :return: A new snapshot, or the same one when it is already in to_units.
+    '''
+    if snapshot.units == to_units:
+        return snapshot
+    import numpy as np  # Not at module level: core imports this module and stays light
+    temperatures = convert_temperature(np.array([getattr(snapshot, field) for field in TEMPERATURE_FIELDS]),
+                                       snapshot.units, to_units)
+    changes = dict(zip(TEMPERATURE_FIELDS, temperatures.tolist()))
+    changes["wind_speed"] = float(convert_speed(snapshot.wind_speed, snapshot.units, to_units))
+    return snapshot._replace(units=to_units, **changes)
+
+
+def convert_fields(record, to_units: str, from_units: str = DEFAULT_UNITS):
+    '''
+    Convert the temperature and speed fields of a NamedTuple of arrays,
+    such as weather.history.Series; other fields are kept.
+    :param record: NamedTuple with some of TEMPERATURE_FIELDS and SPEED_FIELDS.
+    :param to_units: Target unit system.
+    :param from_units: Unit system of record.
+    :return: A new record of the same type.
+    '''
+    if from_units == to_units:
+        return record
+    import numpy as np
+    fields = record._fields
+    changes = {}
+    temperature_fields = [field for field in TEMPERATURE_FIELDS if field in fields]
+    if temperature_fields:
+        stacked = convert_temperature(np.vstack([getattr(record, field) for field in temperature_fields]),
+                                      from_units, to_units)
+        changes.update(zip(temperature_fields, stacked))
+    for field in SPEED_FIELDS:
+        if field in fields:
+            changes[field] = convert_speed(getattr(record, field), from_units, to_units)
+    return record._replace(**changes)
+
+
+def format_temperature(value: float, units: str) -> str:
+    '''
+    :param value: Temperature in the given system.
+    :param units: Unit system of value.
+    :return: e.g. "62 F"
+    '''
+    return f"{int(round(value))} {UNIT_SYSTEMS[units].temperature}"
+
+
+def format_speed(value: float, units: str) -> str:
+    '''
+    :param value: Wind speed in the given system.
+    :param units: Unit system of value.
+    :return: e.g. "3.6 m/s"
+    '''
+    return f"{value:.1f} {UNIT_SYSTEMS[units].speed}"
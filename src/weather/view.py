@@ -1,44 +1,47 @@
-#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'Ui/view.ui'
+#
+# Created by: PyQt5 UI code generator 5.15.11
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
 
 from PyQt5 import QtCore, QtGui, QtWidgets
-from PyQt5.QtCore import Qt
+
 
 class Ui_MainWindow(object):
-    
     def setupUi(self, MainWindow):
         MainWindow.setObjectName("MainWindow")
-        MainWindow.resize(502, 315)
+        MainWindow.resize(752, 315)
         sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
         sizePolicy.setHorizontalStretch(0)
         sizePolicy.setVerticalStretch(0)
         sizePolicy.setHeightForWidth(MainWindow.sizePolicy().hasHeightForWidth())
         MainWindow.setSizePolicy(sizePolicy)
-        MainWindow.setStyleSheet("background-color: rgba(36, 31, 49, 120);\n"
-"color: rgb(246, 245, 244);")
         self.centralwidget = QtWidgets.QWidget(MainWindow)
         self.centralwidget.setObjectName("centralwidget")
         self.label_icon = QtWidgets.QLabel(self.centralwidget)
         self.label_icon.setGeometry(QtCore.QRect(410, 0, 91, 51))
-        self.label_icon.setStyleSheet("background-color: rgba(36, 31, 49, 120);\n"
-"color: rgb(222, 221, 218);")
         self.label_icon.setText("")
         self.label_icon.setObjectName("label_icon")
         self.listView = QtWidgets.QListView(self.centralwidget)
         self.listView.setGeometry(QtCore.QRect(10, 50, 491, 261))
-        self.listView.setStyleSheet("background-color: rgba(36, 31, 49, 120);\n"
-"color: rgb(246, 245, 244);")
         self.listView.setObjectName("listView")
+        self.forecastView = QtWidgets.QListView(self.centralwidget)
+        self.forecastView.setGeometry(QtCore.QRect(510, 50, 231, 261))
+        self.forecastView.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+        self.forecastView.setObjectName("forecastView")
         self.lineEdit = QtWidgets.QLineEdit(self.centralwidget)
         self.lineEdit.setGeometry(QtCore.QRect(10, 10, 401, 31))
         font = QtGui.QFont()
         font.setPointSize(10)
         self.lineEdit.setFont(font)
-        self.lineEdit.setStyleSheet("background-color: rgba(36, 31, 49, 120);\n"
-"color: rgb(246, 245, 244);")
         self.lineEdit.setObjectName("lineEdit")
         MainWindow.setCentralWidget(self.centralwidget)
         self.menubar = QtWidgets.QMenuBar(MainWindow)
-        self.menubar.setGeometry(QtCore.QRect(0, 0, 502, 22))
+        self.menubar.setGeometry(QtCore.QRect(0, 0, 752, 22))
         self.menubar.setObjectName("menubar")
         self.menuGeo = QtWidgets.QMenu(self.menubar)
         self.menuGeo.setObjectName("menuGeo")
@@ -46,15 +49,11 @@ class Ui_MainWindow(object):
         self.menuTheme.setObjectName("menuTheme")
         self.menuTranslucent = QtWidgets.QMenu(self.menuTheme)
         self.menuTranslucent.setObjectName("menuTranslucent")
+        self.menuWatchlist = QtWidgets.QMenu(self.menubar)
+        self.menuWatchlist.setObjectName("menuWatchlist")
+        self.menuUnits = QtWidgets.QMenu(self.menubar)
+        self.menuUnits.setObjectName("menuUnits")
         MainWindow.setMenuBar(self.menubar)
-
-        # Add corner widget (time label) to the top-right corner of the menu bar
-        self.time_label = QtWidgets.QLabel("Loading...")
-        self.time_label.setStyleSheet("color: rgb(246, 245, 244); font-weight: bold;")
-        self.time_label.setAlignment(Qt.AlignCenter)
-        self.time_label.setFixedWidth(120)  # Adjust width as necessary
-        self.menubar.setCornerWidget(self.time_label, Qt.TopRightCorner)
-        
         self.statusbar = QtWidgets.QStatusBar(MainWindow)
         self.statusbar.setObjectName("statusbar")
         MainWindow.setStatusBar(self.statusbar)
@@ -70,6 +69,28 @@ class Ui_MainWindow(object):
         self.actionHeavyTranslucency.setObjectName("actionHeavyTranslucency")
         self.actionLightTranslucency = QtWidgets.QAction(MainWindow)
         self.actionLightTranslucency.setObjectName("actionLightTranslucency")
+        self.actionShow_Watchlist = QtWidgets.QAction(MainWindow)
+        self.actionShow_Watchlist.setObjectName("actionShow_Watchlist")
+        self.actionShow_Dashboard = QtWidgets.QAction(MainWindow)
+        self.actionShow_Dashboard.setObjectName("actionShow_Dashboard")
+        self.actionAdd_Watchlist = QtWidgets.QAction(MainWindow)
+        self.actionAdd_Watchlist.setObjectName("actionAdd_Watchlist")
+        self.actionRemove_Watchlist = QtWidgets.QAction(MainWindow)
+        self.actionRemove_Watchlist.setObjectName("actionRemove_Watchlist")
+        self.actionShow_Metrics = QtWidgets.QAction(MainWindow)
+        self.actionShow_Metrics.setCheckable(True)
+        self.actionShow_Metrics.setObjectName("actionShow_Metrics")
+        self.unitsGroup = QtWidgets.QActionGroup(MainWindow)
+        self.unitsGroup.setObjectName("unitsGroup")
+        self.actionUnits_Imperial = QtWidgets.QAction(self.unitsGroup)
+        self.actionUnits_Imperial.setCheckable(True)
+        self.actionUnits_Imperial.setObjectName("actionUnits_Imperial")
+        self.actionUnits_Metric = QtWidgets.QAction(self.unitsGroup)
+        self.actionUnits_Metric.setCheckable(True)
+        self.actionUnits_Metric.setObjectName("actionUnits_Metric")
+        self.actionUnits_Standard = QtWidgets.QAction(self.unitsGroup)
+        self.actionUnits_Standard.setCheckable(True)
+        self.actionUnits_Standard.setObjectName("actionUnits_Standard")
         self.menuGeo.addAction(self.actionChange_Location)
         self.menuGeo.addAction(self.actionChange_Default)
         self.menuTranslucent.addAction(self.actionHeavyTranslucency)
@@ -78,18 +99,23 @@ class Ui_MainWindow(object):
         self.menuTheme.addSeparator()
         self.menuTheme.addAction(self.actionDark)
         self.menuTheme.addAction(self.actionLight)
+        self.menuTheme.addSeparator()
+        self.menuTheme.addAction(self.actionShow_Metrics)
+        self.menuWatchlist.addAction(self.actionShow_Watchlist)
+        self.menuWatchlist.addAction(self.actionShow_Dashboard)
+        self.menuWatchlist.addSeparator()
+        self.menuWatchlist.addAction(self.actionAdd_Watchlist)
+        self.menuWatchlist.addAction(self.actionRemove_Watchlist)
+        self.menuUnits.addAction(self.actionUnits_Imperial)
+        self.menuUnits.addAction(self.actionUnits_Metric)
+        self.menuUnits.addAction(self.actionUnits_Standard)
         self.menubar.addAction(self.menuGeo.menuAction())
+        self.menubar.addAction(self.menuWatchlist.menuAction())
+        self.menubar.addAction(self.menuUnits.menuAction())
         self.menubar.addAction(self.menuTheme.menuAction())
 
         self.retranslateUi(MainWindow)
-        QtCore.QMetaObject.connectSlotsByName(MainWindow)   
-
-        # Application only works in translucent mode with this code.  ???
-        self.setAttribute(Qt.WA_TranslucentBackground)
-        self.listView.setAttribute(Qt.WA_TranslucentBackground)
-        self.lineEdit.setAttribute(Qt.WA_TranslucentBackground)
-        self.menubar.setAttribute(Qt.WA_TranslucentBackground)
-        self.label_icon.setAttribute(Qt.WA_TranslucentBackground)
+        QtCore.QMetaObject.connectSlotsByName(MainWindow)
 
     def retranslateUi(self, MainWindow):
         _translate = QtCore.QCoreApplication.translate
@@ -97,16 +123,24 @@ class Ui_MainWindow(object):
         self.menuGeo.setTitle(_translate("MainWindow", "Geo"))
         self.menuTheme.setTitle(_translate("MainWindow", "Theme"))
         self.menuTranslucent.setTitle(_translate("MainWindow", "Translucent"))
+        self.menuWatchlist.setTitle(_translate("MainWindow", "Watchlist"))
+        self.menuUnits.setTitle(_translate("MainWindow", "Units"))
         self.actionChange_Location.setText(_translate("MainWindow", "Change Location"))
         self.actionChange_Default.setText(_translate("MainWindow", "Change Default Location"))
         self.actionDark.setText(_translate("MainWindow", "Dark"))
         self.actionLight.setText(_translate("MainWindow", "Light"))
         self.actionHeavyTranslucency.setText(_translate("MainWindow", "Heavy"))
         self.actionLightTranslucency.setText(_translate("MainWindow", "Light"))
+        self.actionShow_Watchlist.setText(_translate("MainWindow", "Show Watchlist"))
+        self.actionShow_Dashboard.setText(_translate("MainWindow", "Dashboard"))
+        self.actionAdd_Watchlist.setText(_translate("MainWindow", "Add Current City"))
+        self.actionRemove_Watchlist.setText(_translate("MainWindow", "Remove Current City"))
+        self.actionShow_Metrics.setText(_translate("MainWindow", "Show Metrics"))
+        self.actionUnits_Imperial.setText(_translate("MainWindow", "Imperial (F, MPH)"))
+        self.actionUnits_Metric.setText(_translate("MainWindow", "Metric (C, m/s)"))
+        self.actionUnits_Standard.setText(_translate("MainWindow", "Standard (K, m/s)"))
 
 
-    
-
 if __name__ == "__main__":
     import sys
     app = QtWidgets.QApplication(sys.argv)
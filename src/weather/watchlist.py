@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+import json
+from typing import NamedTuple
+
+from .cache import normalize_key
+from .core import WeatherClient, WeatherSnapshot
+
+
+class WatchEntry(NamedTuple):
+    '''
+    One watched city. city_id is 0 until the query has been resolved.
+    '''
+    query: str
+    city_id: int = 0
+    lat: float = 0.0
+    lon: float = 0.0
+
+
+class Watchlist:
+    '''
+    Ordered list of watched cities.
+
+    Each query is resolved to an OpenWeatherMap city ID once; after that the
+    whole list is refreshed with batched /group calls (20 cities per request).
+    '''
+    def __init__(self, entries=()) -> None:
+        '''
+        :param entries: Initial WatchEntry objects.
+        :return: None
+        '''
+        self.entries = list(entries)
+        self._index = None  # SpatialIndex over the resolved entries, built by within()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def find(self, query: str) -> int:
+        '''
+        :param query: City query.
+        :return: Position of the entry, or -1.
+        '''
+        key = normalize_key(query)
+        for position, entry in enumerate(self.entries):
+            if normalize_key(entry.query) == key:
+                return position
+        return -1
+
+    def add(self, query: str, snapshot: WeatherSnapshot = None) -> bool:
+        '''
+        Watch a city. A snapshot already fetched for it resolves the ID for free.
+        :param query: City query.
+        :param snapshot: Optional current observation of the city.
+        :return: False if the city was already watched.
+        '''
+        if self.find(query) >= 0:
+            return False
+        if snapshot is not None:
+            self.entries.append(WatchEntry(query, snapshot.city_id, snapshot.lat, snapshot.lon))
+        else:
+            self.entries.append(WatchEntry(query))
+        self._index = None
+        return True
+
+    def remove(self, query: str) -> bool:
+        '''
+        :param query: City query.
+        :return: False if the city was not watched.
+        '''
+        position = self.find(query)
+        if position < 0:
+            return False
+        del self.entries[position]
+        self._index = None
+        return True
+
+    def update(self, entry: WatchEntry) -> bool:
+        '''
+        Replace the entry with the same query, e.g. once its city ID is known.
+        :param entry: The new entry.
+        :return: False if the city was not watched.
+        '''
+        position = self.find(entry.query)
+        if position < 0:
+            return False
+        self.entries[position] = entry
+        self._index = None
+        return True
+
+    def resolve(self, client: WeatherClient) -> list:
+        '''
+        Look up the city ID of every unresolved entry (one request each, once).
+        :param client: Client to query with.
+        :return: Queries that could not be resolved.
+        '''
+        failed = []
+        for position, entry in enumerate(self.entries):
+            if entry.city_id:
+                continue
+            try:
+                snapshot = client.current(entry.query)
+            except Exception:
+                failed.append(entry.query)
+                continue
+            self.entries[position] = WatchEntry(entry.query, snapshot.city_id, snapshot.lat, snapshot.lon)
+            self._index = None
+        return failed
+
+    def refresh(self, client: WeatherClient, use_cache: bool = False) -> dict:
+        '''
+        Fetch current conditions for every resolved entry through /group.
+        Each response is also stored in the client's cache under its query.
+        :param client: Client to query with.
+        :param use_cache: Answer entries with a fresh cached response without a request.
+        :return: dict of query -> WeatherSnapshot.
+        '''
+        # Two queries can resolve to the same city; one /group result serves both
+        queries = {}
+        for entry in self.entries:
+            if entry.city_id:
+                queries.setdefault(entry.city_id, []).append(entry.query)
+        snapshots = {}
+        units = client.units
+        if use_cache and client.cache is not None:
+            for city_id, names in list(queries.items()):
+                fresh = [(query, client.cache.get_fresh(client.cache_key(query, units))) for query in names]
+                if all(cached is not None for _, cached in fresh):
+                    for query, cached in fresh:
+                        snapshots[query] = WeatherSnapshot.from_response(cached, query, units=units)
+                    del queries[city_id]
+        for response in client.group_responses(list(queries), units=units):
+            for query in queries.get(response.get('id'), ()):
+                if client.cache is not None:
+                    client.cache.put(client.cache_key(query, units), response)
+                snapshots[query] = WeatherSnapshot.from_response(response, query, units=units)
+        return snapshots
+
+    def within(self, lat: float, lon: float, radius_km: float) -> list:
+        '''
+        Resolved entries within a radius of a point. The index is built on the
+        first query and reused until the list changes.
+        :param lat: Latitude in degrees.
+        :param lon: Longitude in degrees.
+        :param radius_km: Search radius in kilometres.
+        :return: List of (distance_km, WatchEntry), nearest first.
+        '''
+        if self._index is None:
+            from .spatial import SpatialIndex
+            self._index = SpatialIndex((entry.lat, entry.lon, entry) for entry in self.entries if entry.city_id)
+        return self._index.within(lat, lon, radius_km)
+
+    def dumps(self) -> str:
+        '''
+        Serialise for storage (e.g. in QSettings).
+        :return: JSON string.
+        '''
+        return json.dumps([entry._asdict() for entry in self.entries])
+
+    @classmethod
+    def loads(cls, text: str) -> "Watchlist":
+        '''
+        Restore a watchlist saved with dumps(); bad data gives an empty list.
+        :param text: JSON string.
+        :return: Watchlist
+        '''
+        try:
+            return cls(WatchEntry(**item) for item in json.loads(text or "[]"))
+        except (ValueError, TypeError):
+            return cls()
@@ -1,41 +1,96 @@
 #!/usr/bin/env python3
 
 from .view import *
+from .workers import Worker
+from .transport import Transport
+from .cache import WeatherCache, normalize_key
+from .geocode import Geocoder
+from .gazetteer import Gazetteer
+from .watchlist import Watchlist
+from .core import WeatherClient, WeatherSnapshot, load_api_key
+from .refresh import RefreshPolicy
+from .icons import IconStore
+from .themes import ThemeManager
+from .models import Row, RowListModel
+from .dashboard import DashboardModel, DashboardWindow
+from .history import HistoryStore
+from .metrics import REGISTRY, STARTUP, StallDetector, configure_log, observe_stage, overlay_text, stage
+from .units import UNIT_SYSTEMS, convert_snapshot, format_speed, format_temperature
+from .scheduler import BACKGROUND, INTERACTIVE
 from PyQt5.QtWidgets import *
-from PyQt5.QtGui import QStandardItem, QStandardItemModel, QPixmap
-from PyQt5.QtCore import QTimer, QTime, QSettings
-import datetime as dt
-import requests
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut
+from PyQt5.QtCore import Qt, QTimer, QSettings, QThreadPool, QEvent
+import math
 import os
+import time
+
+NEARBY_KM = 100  # watched cities this close to the displayed one are listed first
 
 
 
 class Controller(QMainWindow, Ui_MainWindow):    
     def __init__(self) -> None:
         '''
-        Initialize the application, set up UI components, and display weather data.
+        Build and show the window shell. Everything that touches files or the
+        network, including the default city prompt, runs in start() once the
+        event loop has painted the first frame.
         :param: None
         :return: None
         '''
         super().__init__()
         self.setupUi(self)
+
+        # Clock in the top-right corner of the menu bar; Designer cannot place corner widgets
+        self.time_label = QLabel("Loading...")
+        self.time_label.setObjectName("time_label")
+        self.time_label.setAlignment(Qt.AlignCenter)
+        self.time_label.setFixedWidth(120)
+        self.menubar.setCornerWidget(self.time_label, Qt.TopRightCorner)
+        # User themes are listed above the separator before Show Metrics
+        self.metricsSeparator = self.menuTheme.actions()[self.menuTheme.actions().index(self.actionShow_Metrics) - 1]
+
+        # Application only works in translucent mode with this code.  ???
+        for widget in (self.listView, self.forecastView, self.lineEdit, self.menubar, self.label_icon):
+            widget.setAttribute(Qt.WA_TranslucentBackground)
         self.set_translucency(True)
 
         #Get default location
         self.settings = QSettings("Prompt", "WeatherApp")
-        saved_default = self.settings.value("default_city", type=str)
-        if not saved_default:
-            saved_default = self.ask_for_default_city()
-            if saved_default:
-                self.settings.setValue("default_city", saved_default)
 
-        self.city = {'default': saved_default or 'Judsonia, AR', 'geo': None}
+        # One precompiled application stylesheet per theme; start() adds the user themes
+        self.themes = ThemeManager(QApplication.instance(), load_user=False)
+        self.themes.apply(self.settings.value("theme", "Dark", type=str))
+
+        self.city = {'default': None, 'geo': None}  # default is set by start()
         self.word_list = []
         self.allow_suggestions = False  # Control suggestions
         self.isTranslucent = True
-        self.API_KEY = self.get_api_key()
+
+        # Network fetches run on pool threads; results come back through signals
+        self.threadpool = QThreadPool.globalInstance()
+        self.fetch_generation = 0
+        # Responses are requested in the display units, so nothing is converted per render
+        self.units = self.settings.value("units", "imperial", type=str)
+        if self.units not in UNIT_SYSTEMS:
+            self.units = "imperial"
+        self.API_KEY = None
+        self.client = None  # stores and clients are opened by start()
+        self.gazetteer = None
+        self.geocoder = None
+        self.snapshot = None
+        self.city_name = ""  # Query of the displayed city, set once its fetch succeeds
+        self.watchlist = Watchlist.loads(self.settings.value("watchlist", "", type=str))
+        self.dashboard = None
+
+        # Refresh just after the provider's next observation is due, less often when hidden or idle
+        self.refresh_policy = RefreshPolicy()
+        self.refresh_failures = 0
+        self.unchanged_polls = 0  # Background fetches in a row that returned the same observation
+        self.inactive_since = None
+        self.loading = False
+        self.showing_weather = False
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.timeout.connect(self.refresh_weather)
         
         # Timer for current time update
         self.timer = QTimer(self)
@@ -46,15 +101,102 @@ class Controller(QMainWindow, Ui_MainWindow):
         self.suggestion_timer.setSingleShot(True)
         self.suggestion_timer.timeout.connect(self.suggest_city_name)
 
-        # Data model for list view
-        self.model = QStandardItemModel()
+        # Suggestion requests are tagged so superseded responses can be dropped
+        self.suggestion_generation = 0
+
+        # Stage timers and counters (weather.metrics); a late heartbeat means the event loop was blocked
+        self.metrics_logged = False  # the log file is opened by start()
+        self.stall_detector = StallDetector()
+        self.stall_timer = QTimer(self)
+        self.stall_timer.timeout.connect(self.stall_detector.beat)
+        self.fetch_started = None
+        self.metrics_label = QLabel(self)
+        self.metrics_label.setObjectName("metrics_label")
+        self.metrics_label.hide()
+        self.statusbar.addPermanentWidget(self.metrics_label)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(self.update_metrics)
+        self.metrics_file = self.settings.value("metrics_file", "", type=str) or os.environ.get("WEATHER_METRICS_FILE")
+        if self.metrics_file:
+            self.metrics_file_timer = QTimer(self)
+            self.metrics_file_timer.timeout.connect(self.write_metrics)
+            self.metrics_file_timer.start(15000)
+            QApplication.instance().aboutToQuit.connect(self.write_metrics)
+        self.update_stall_detector()
+
+        # Condition icons are decoded and scaled once, then served from QPixmapCache
+        self.icons = IconStore(parent=self)
+        self.label_icon.setAlignment(Qt.AlignCenter)
+        self.label_icon.installEventFilter(self)
+
+        # Data model for list view; updates only touch rows that changed
+        self.model = RowListModel(self)
         self.listView.setModel(self.model)
-
-        # Initial setup
+        self.forecast = None
+        self.forecast_generation = 0
+        self.forecast_model = RowListModel(self)
+        self.forecastView.setModel(self.forecast_model)
+
+        # Paint the shell now; start() runs from the event loop right after the first frame
+        self.started = False
+        self.start_scheduled = False
         self.setup_actions()
-        self.get_weather()
-        self.display_weather()
         self.show() 
+        self.windowHandle().screenChanged.connect(self.on_screen_changed)
+        STARTUP.mark("window_shown")
+        QTimer.singleShot(500, self.start)  # in case no frame is painted, e.g. when started minimised
+
+    def start(self) -> None:
+        '''
+        Second half of startup: ask for the default city if none is saved, open
+        the caches and clients, paint the last known observation and revalidate it.
+        :param: None
+        :return: None
+        '''
+        if self.started:
+            return
+        self.started = True
+        saved_default = self.settings.value("default_city", type=str)
+        if not saved_default:
+            saved_default = self.ask_for_default_city()
+            if saved_default:
+                self.settings.setValue("default_city", saved_default)
+        self.city['default'] = saved_default or 'Judsonia, AR'
+        self.API_KEY = self.get_api_key()
+        self.metrics_logged = configure_log()
+        self.update_stall_detector()
+        self.load_user_themes()
+
+        # requests and geopy are imported by the first fetch and the first search, on worker threads
+        self.transport = Transport(
+            connect_timeout=self.settings.value("connect_timeout", 3.05, type=float),
+            read_timeout=self.settings.value("read_timeout", 10.0, type=float),
+        )
+        self.cache = WeatherCache(ttl=self.settings.value("cache_ttl", 600, type=int))
+        self.history = HistoryStore()  # Every observation received, for charts and analysis
+        QApplication.instance().aboutToQuit.connect(self.history.flush)
+        self.client = WeatherClient(self.API_KEY, transport=self.transport, cache=self.cache,
+                                    base_url=self.settings.value("api_base_url", "", type=str) or None,
+                                    history=self.history, units=self.units)
+        self.geocoder = Geocoder(url=self.settings.value("nominatim_url", "", type=str) or None)
+        self.gazetteer = Gazetteer.open_default()  # None until an index has been built
+        STARTUP.mark("stores_opened")
+
+        # Paint the last known observation, then revalidate it
+        self.show_cached_weather(self.city['default'])
+        self.get_weather()
+        STARTUP.mark("fetch_started")
+        self.icons.preload(self.label_icon.size(), self.label_icon.devicePixelRatioF())
+
+    def paintEvent(self, event) -> None:
+        '''
+        Schedule start() behind the first frame.
+        '''
+        super().paintEvent(event)
+        if not self.start_scheduled:
+            self.start_scheduled = True
+            STARTUP.mark("first_paint")
+            QTimer.singleShot(0, self.start)
 
     def ask_for_default_city(self) -> str:
         """
@@ -98,28 +240,61 @@ class Controller(QMainWindow, Ui_MainWindow):
         self.listView.doubleClicked.connect(self.display_selected_city_weather)
         self.actionChange_Location.triggered.connect(self.toggle_city_editing)
         self.actionChange_Default.triggered.connect(self.change_default_city)
+        self.actionShow_Watchlist.triggered.connect(self.show_watchlist)
+        self.actionShow_Dashboard.triggered.connect(self.show_dashboard)
+        unit_actions = {"imperial": self.actionUnits_Imperial, "metric": self.actionUnits_Metric,
+                        "standard": self.actionUnits_Standard}
+        unit_actions[self.units].setChecked(True)
+        for units, action in unit_actions.items():
+            action.triggered.connect(lambda checked, units=units: self.set_units(units))
+        self.actionAdd_Watchlist.triggered.connect(self.add_to_watchlist)
+        self.actionRemove_Watchlist.triggered.connect(self.remove_from_watchlist)
 
         self.actionHeavyTranslucency.triggered.connect(lambda: self.set_translucency(True))
         self.actionLightTranslucency.triggered.connect(lambda: self.set_translucency(False))
         self.actionDark.triggered.connect(self.dark_mode)
         self.actionLight.triggered.connect(self.light_mode)
+        self.actionShow_Metrics.toggled.connect(self.show_metrics)
+        self.actionShow_Metrics.setChecked(self.settings.value("show_metrics", False, type=bool))
+
+    def load_user_themes(self) -> None:
+        '''
+        Read the theme files in the data directory, give each its own menu entry
+        below the built-in themes and apply the saved theme if it is one of them.
+        :param: None
+        :return: None
+        '''
+        self.themes.load_user_themes()
+        for name in self.themes.names():
+            if name not in ("Dark", "Light"):
+                action = QAction(name, self)
+                action.triggered.connect(lambda checked, name=name: self.set_theme(name))
+                self.menuTheme.insertAction(self.metricsSeparator, action)
+        saved = self.settings.value("theme", "Dark", type=str)
+        if saved != self.themes.current and saved in self.themes.names():
+            self.themes.apply(saved)
+        if self.themes.errors:
+            self.statusbar.showMessage("Skipped themes: " + "; ".join(self.themes.errors), 10000)
 
     def set_translucency(self, enable: bool) -> None:
         """
-        Toggle translucency for this window and all child widgets.
+        Toggle translucency of the window background.
+        Child widgets draw the theme's translucent colours over it, so only the window needs changing.
         """
-
-        # Apply to main window
         self.setAttribute(Qt.WA_TranslucentBackground, enable)
         self.setAttribute(Qt.WA_NoSystemBackground, enable)
+        self.update()
 
-        # Apply to all child widgets
-        for widget in self.findChildren(QWidget):
-            widget.setAttribute(Qt.WA_TranslucentBackground, enable)
-
-        if not enable:
-            self.setAttribute(Qt.WA_NoSystemBackground, False)
-            
+    def set_theme(self, name: str) -> None:
+        '''
+        Apply a theme to the whole application and remember it.
+        :param name: Theme name.
+        :return: None
+        '''
+        elapsed = self.themes.apply(name)
+        self.settings.setValue("theme", self.themes.current)
+        if not self.themes.within_budget():
+            self.statusbar.showMessage(f"Theme switch took {elapsed:.1f} ms", 5000)
 
     def dark_mode(self) -> None:
         '''
@@ -127,12 +302,7 @@ class Controller(QMainWindow, Ui_MainWindow):
         :param: None
         :return: None
         '''
-        #Apply to main window
-        self.setStyleSheet("background-color: rgba(36, 31, 49, 120);\ncolor: rgb(246, 245, 244);")
-
-        #Apply to all child widgets
-        for widget in self.findChildren(QWidget):
-            widget.setStyleSheet("background-color: rgba(36, 31, 49, 120);\ncolor: rgb(246, 245, 244);")
+        self.set_theme("Dark")
     
     def light_mode(self) -> None:
         '''
@@ -140,9 +310,56 @@ class Controller(QMainWindow, Ui_MainWindow):
         :param: None
         :return: None        
         '''        
-        self.setStyleSheet("background-color: rgba(245, 245, 245, 0.8);\ncolor: rgba(50, 50, 50, 1);")
-        for widget in self.findChildren(QWidget):
-            widget.setStyleSheet("background-color: rgba(245, 245, 245, 0.8);\ncolor: rgba(50, 50, 50, 1);")
+        self.set_theme("Light")
+
+    def show_metrics(self, enable: bool) -> None:
+        '''
+        Show or hide the metrics overlay in the status bar.
+        :param enable: True to show it, refreshed every second.
+        :return: None
+        '''
+        self.settings.setValue("show_metrics", enable)
+        self.metrics_label.setVisible(enable)
+        if enable:
+            self.update_metrics()
+            self.metrics_timer.start(1000)
+        else:
+            self.metrics_timer.stop()
+        self.update_stall_detector()
+
+    def update_stall_detector(self) -> None:
+        '''
+        Run the heartbeat only while the overlay, the metrics file or the metrics
+        log can report stalls, and not while the window is minimised.
+        :param: None
+        :return: None
+        '''
+        wanted = self.metrics_timer.isActive() or bool(self.metrics_file) or self.metrics_logged
+        if wanted and not self.isMinimized():
+            if not self.stall_timer.isActive():
+                self.stall_detector.reset()  # The pause is not a stall
+                self.stall_timer.start(int(self.stall_detector.interval * 1000))
+        else:
+            self.stall_timer.stop()
+
+    def update_metrics(self) -> None:
+        '''
+        Refresh the metrics overlay.
+        :param: None
+        :return: None
+        '''
+        self.metrics_label.setText(overlay_text())
+
+    def write_metrics(self) -> None:
+        '''
+        Write all metrics in Prometheus format to the configured file.
+        :param: None
+        :return: None
+        '''
+        try:
+            REGISTRY.write(self.metrics_file)
+        except OSError as exc:
+            self.statusbar.showMessage(f"Could not write metrics: {exc}", 10000)
 
     def on_text_changed(self) -> None:
         '''
@@ -158,14 +375,13 @@ class Controller(QMainWindow, Ui_MainWindow):
         :param city_name: The name of the city entered by the user.
         :return: A list of matching city names or an error message.
         '''
-        geolocator = Nominatim(user_agent="Weather app (mail@gmail.com)")
-
+        from geopy.exc import GeocoderTimedOut  # geopy loads with the first search, not at startup
         try:
-            # Perform geocoding to find matching cities
-            location = geolocator.geocode(city_name, exactly_one=False, language='en')
+            # Cached, or a filtered refinement of a cached query, before asking Nominatim
+            addresses = self.geocoder.search(city_name)
 
-            if location:
-                return [loc.address for loc in location]
+            if addresses:
+                return addresses
             else:
                 return ["No matches found."]
         except GeocoderTimedOut:
@@ -179,12 +395,13 @@ class Controller(QMainWindow, Ui_MainWindow):
         '''
         selected_items = self.listView.selectedIndexes()
         if selected_items:
-            selected_city = selected_items[0].data()
-            self.city_name = selected_city
+            # Watchlist rows carry their query, suggestion rows are the query
+            selected_city = selected_items[0].data(Qt.UserRole) or selected_items[0].data()
             self.lineEdit.blockSignals(True)  # Avoid triggering on_text_changed
             self.lineEdit.setText(selected_city)
             self.lineEdit.blockSignals(False)
 
+            self.suggestion_generation += 1  # Drop suggestions still in flight
             self.get_weather()
 
     def toggle_city_editing(self) -> None:
@@ -195,6 +412,7 @@ class Controller(QMainWindow, Ui_MainWindow):
         '''
         self.lineEdit.clear()
         self.model.clear()
+        self.showing_weather = False
 
         self.listView.setSelectionMode(QListView.SingleSelection)
 
@@ -215,15 +433,214 @@ class Controller(QMainWindow, Ui_MainWindow):
         if not self.allow_suggestions:
             return
 
+        # Anything still in flight is now stale
+        self.suggestion_generation += 1
+        generation = self.suggestion_generation
+
         city_name = self.lineEdit.text().strip()
         if not city_name:
             self.model.clear()
             return
 
-        self.word_list = self.get_city_state(city_name)
-        self.model.clear()
-        for word in self.word_list:
-            self.model.appendRow(QStandardItem(word))
+        # Offline index first, the network geocoder is the fallback
+        if self.gazetteer is not None:
+            local = self.gazetteer.suggest(city_name)
+            if local:
+                self.show_suggestions(local, generation)
+                return
+
+        if self.geocoder is None:
+            self.suggestion_timer.start(100)  # start() has not opened the geocoder yet; try again then
+            return
+
+        cached = self.geocoder.lookup(normalize_key(city_name))
+        if cached is not None:
+            self.show_suggestions(cached or ["No matches found."], generation)
+            return
+
+        delay = self.geocoder.scheduler.delay("nominatim")
+        if delay > 0:
+            # Over the 1 request/second budget: retry when it allows, with whatever text is current then
+            self.suggestion_timer.start(int(delay * 1000) + 1)
+            return
+
+        worker = Worker(self.get_city_state, city_name)
+        worker.signals.finished.connect(lambda words: self.show_suggestions(words, generation))
+        worker.signals.error.connect(lambda message: self.show_suggestions([message], generation))
+        self.threadpool.start(worker)
+
+    def show_suggestions(self, words: list, generation: int) -> None:
+        '''
+        Fill the list view with suggestions unless a newer request superseded them.
+        :param words: Suggested city names.
+        :param generation: The suggestion counter value the request was started with.
+        :return: None
+        '''
+        if generation != self.suggestion_generation or not self.allow_suggestions:
+            return
+
+        self.word_list = words
+        self.showing_weather = False
+        self.model.set_rows(self.word_list)
+
+    def add_to_watchlist(self) -> None:
+        '''
+        Watch the displayed city.
+        :param: None
+        :return: None
+        '''
+        if self.snapshot is None:
+            return
+        if self.watchlist.add(self.city_name, self.snapshot):
+            self.settings.setValue("watchlist", self.watchlist.dumps())
+            self.statusbar.showMessage(f"Added {self.city_name} to the watchlist", 5000)
+
+    def remove_from_watchlist(self) -> None:
+        '''
+        Stop watching the displayed city.
+        :param: None
+        :return: None
+        '''
+        if self.snapshot is None:
+            return
+        if self.watchlist.remove(self.city_name):
+            self.settings.setValue("watchlist", self.watchlist.dumps())
+            self.statusbar.showMessage(f"Removed {self.city_name} from the watchlist", 5000)
+
+    def show_watchlist(self) -> None:
+        '''
+        Refresh every watched city on a worker thread and list them.
+        :param: None
+        :return: None
+        '''
+        if not len(self.watchlist):
+            self.statusbar.showMessage("The watchlist is empty", 5000)
+            return
+
+        self.fetch_generation += 1  # A pending single-city fetch must not replace the list
+        worker = Worker(self.fetch_watchlist, Watchlist(self.watchlist.entries))
+        worker.signals.finished.connect(self.on_watchlist_fetched)
+        worker.signals.error.connect(lambda message: self.statusbar.showMessage(message, 10000))
+        self.statusbar.showMessage("Refreshing watchlist...")
+        self.threadpool.start(worker)
+
+    def set_units(self, units: str) -> None:
+        '''
+        Switch the display units. What is on screen is converted locally,
+        later requests ask the API for the new units directly.
+        :param units: "imperial", "metric" or "standard".
+        :return: None
+        '''
+        if units == self.units:
+            return
+        self.units = units
+        if self.client is not None:  # start() creates the client with self.units
+            self.client.units = units
+        self.settings.setValue("units", units)
+        if self.dashboard is not None:
+            self.dashboard.model.set_units(units)
+        if self.forecast is not None:
+            self.forecast_model.set_rows(self.forecast.summary_lines(units))
+        if self.snapshot is not None:
+            self.snapshot = convert_snapshot(self.snapshot, units)
+            if self.showing_weather:
+                self.display_weather()
+
+    def show_dashboard(self) -> None:
+        '''
+        Open the dashboard over the current watchlist; rows load as they scroll into view.
+        :param: None
+        :return: None
+        '''
+        if not len(self.watchlist):
+            self.statusbar.showMessage("The watchlist is empty", 5000)
+            return
+
+        if self.dashboard is not None:
+            self.dashboard.close()
+        model = DashboardModel(self.watchlist.entries, self.client, self.threadpool)
+        model.entries_resolved.connect(self.on_watch_entries_resolved)
+        self.dashboard = DashboardWindow(model, self.icons, parent=self)
+        model.setParent(self.dashboard)
+        self.dashboard.city_selected.connect(self.show_city)
+        self.dashboard.show()
+
+    def on_watch_entries_resolved(self, entries: list) -> None:
+        '''
+        Keep city IDs looked up by the dashboard so they are not looked up again.
+        :param entries: WatchEntry objects with their city_id set.
+        :return: None
+        '''
+        for entry in entries:
+            self.watchlist.update(entry)
+        self.settings.setValue("watchlist", self.watchlist.dumps())
+
+    def show_city(self, query: str) -> None:
+        '''
+        Show the weather for a city picked outside the main list.
+        :param query: City query.
+        :return: None
+        '''
+        self.lineEdit.blockSignals(True)
+        self.lineEdit.setText(query)
+        self.lineEdit.blockSignals(False)
+        self.suggestion_generation += 1
+        self.get_weather()
+
+    def fetch_watchlist(self, watchlist: Watchlist) -> tuple:
+        '''
+        Resolve new entries and fetch the whole list with batched /group calls,
+        then name every resolved city from the gazetteer when one is loaded.
+        Runs on a worker thread against a copy of the watchlist.
+        :param watchlist: Copy of self.watchlist.
+        :return: (resolved watchlist, dict of query -> WeatherSnapshot, dict of query -> place label,
+            unresolved queries)
+        '''
+        failed = watchlist.resolve(self.client)
+        snapshots = watchlist.refresh(self.client)
+        labels = {}
+        if self.gazetteer is not None:
+            reverse = self.gazetteer.reverse
+            for entry in watchlist:
+                place = reverse.locate(entry.lat, entry.lon) if entry.city_id else None
+                if place is not None:
+                    labels[entry.query] = place.label
+        return watchlist, snapshots, labels, failed
+
+    def on_watchlist_fetched(self, result: tuple) -> None:
+        '''
+        Store newly resolved city IDs and display one row per watched city,
+        those near the displayed city first.
+        :param result: Return value of fetch_watchlist.
+        :return: None
+        '''
+        resolved, snapshots, labels, failed = result
+        for entry in resolved:
+            if entry.city_id:
+                self.watchlist.update(entry)
+        self.settings.setValue("watchlist", self.watchlist.dumps())
+
+        nearby = {}
+        if self.snapshot is not None:
+            nearby = {entry.query: distance for distance, entry
+                      in self.watchlist.within(self.snapshot.lat, self.snapshot.lon, NEARBY_KM)}
+
+        self.showing_weather = False
+        rows = []
+        for entry in sorted(self.watchlist, key=lambda entry: nearby.get(entry.query, math.inf)):
+            name = labels.get(entry.query, entry.query)
+            snapshot = snapshots.get(entry.query)
+            if snapshot is None:
+                text = f"{name}: unavailable"
+            else:
+                text = f"{name}: {format_temperature(snapshot.temp, snapshot.units)}, {snapshot.condition}"
+            if entry.query in nearby and entry.city_id != self.snapshot.city_id:
+                text += f" ({nearby[entry.query]:.0f} km away)"
+            rows.append(Row(text, entry.query))
+        self.model.set_rows(rows)
+
+        self.listView.setSelectionMode(QListView.SingleSelection)
+        self.statusbar.showMessage(f"Could not find: {', '.join(failed)}" if failed else "", 10000)
 
     def get_api_key(self) -> str:
         '''
@@ -231,63 +648,274 @@ class Controller(QMainWindow, Ui_MainWindow):
         :param: None
         :return: string of the API_KEY
 
-        Place you API_KEY in api_key.txt file or hard code it
+        Place you API_KEY in key/api_key.txt or set OPENWEATHER_API_KEY.
+        No key is needed when api_base_url points at a weather-cli proxy.
         '''
-        #Navigate up to project root directory
-        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-        api_key_path = os.path.join(project_root,"key", "api_key.txt")
-        
-        try:
-            with open(api_key_path, 'r') as file:
-                API_KEY = file.read().strip() or self.API_KEY
-        except FileNotFoundError:
+        API_KEY = load_api_key()
+        uses_proxy = self.settings.value("api_base_url", "", type=str) or os.environ.get("WEATHER_API_URL")
+        if not API_KEY and not uses_proxy:
             QMessageBox.critical(self, "Error", "API key file not found!")
-            return
         return API_KEY
 
-    def get_weather(self) -> None:
+    def get_weather(self, background: bool = False) -> None:
+        '''
+        Start fetching weather data for the selected city on a worker thread.
+        The result is handled by on_weather_fetched once it arrives; only then
+        does the query become self.city_name.
+        :param background: True for scheduled refreshes of the displayed city; they
+            bypass the cache, run at background priority and show no loading state.
+        :return: None
+        '''
+        if background and self.snapshot is not None:
+            query = self.snapshot.query  # Refresh what is on screen, not what was typed last
+        else:
+            background = False
+            query = self.lineEdit.text() or self.city['default']
+
+        # Only the most recent request may update the display
+        self.fetch_generation += 1
+        generation = self.fetch_generation
+
+        worker = Worker(self.fetch_weather, query, background)
+        worker.signals.finished.connect(
+            lambda snapshot: self.on_weather_fetched(snapshot, generation, background, query))
+        worker.signals.error.connect(lambda message: self.on_weather_failed(message, generation, background))
+
+        self.refresh_timer.stop()
+        self.fetch_started = time.perf_counter()
+        if not background:
+            self.set_loading(True, query)
+        self.threadpool.start(worker)
+
+    def fetch_weather(self, city_name: str, background: bool = False) -> WeatherSnapshot:
+        '''
+        Request current weather for a city. Runs on a worker thread, so it must not touch widgets.
+        :param city_name: The city to query.
+        :param background: True for scheduled refreshes.
+        :return: WeatherSnapshot
+        '''
+        if background:
+            return self.client.current(city_name, BACKGROUND, refresh=True)
+        return self.client.current(city_name, INTERACTIVE)
+
+    def refresh_weather(self) -> None:
         '''
-        Fetch and process weather data for the selected city.
+        Scheduled refresh of the displayed city.
         :param: None
         :return: None
         '''
-        
-        BASE_URL = "https://api.openweathermap.org/data/2.5/weather?"
+        if self.snapshot is None:
+            self.get_weather()  # Nothing shown yet, retry the initial fetch
+        elif self.loading or not self.showing_weather:
+            self.schedule_refresh()  # Busy, or the list shows suggestions/watchlist
+        else:
+            self.get_weather(background=True)
+
+    def schedule_refresh(self) -> None:
+        '''
+        Arm the refresh timer from the current observation time and window state.
+        :param: None
+        :return: None
+        '''
+        if self.snapshot is None:
+            return
+        idle_seconds = time.monotonic() - self.inactive_since if self.inactive_since is not None else 0
+        delay = self.refresh_policy.next_delay(
+            self.snapshot.observed_at,
+            visible=self.isVisible() and not self.isMinimized(),
+            idle_seconds=idle_seconds,
+            unchanged=self.unchanged_polls,
+        )
+        self.refresh_timer.start(int(delay * 1000))
 
-        self.city_name = self.lineEdit.text() or self.city['default']
-        url = f"{BASE_URL}appid={self.API_KEY}&q={self.city_name}"
+    def changeEvent(self, event) -> None:
+        '''
+        Back off while minimised or inactive; refresh at once when restored with stale data.
+        :param event: The state change.
+        :return: None
+        '''
+        super().changeEvent(event)
+        if event.type() == QEvent.ActivationChange:
+            self.inactive_since = None if self.isActiveWindow() else time.monotonic()
+        elif event.type() == QEvent.WindowStateChange:
+            self.update_stall_detector()
+            if self.snapshot is None:
+                return
+            if not self.isMinimized() and self.refresh_policy.is_stale(self.snapshot.observed_at):
+                self.refresh_weather()
+            else:
+                self.schedule_refresh()
 
-        response = requests.get(url)
-        if response.status_code != 200:
+    def show_cached_weather(self, city_name: str) -> None:
+        '''
+        Display the cached observation for a city, if any, without touching the network.
+        :param city_name: The city to look up.
+        :return: None
+        '''
+        snapshot = self.client.cached(city_name)
+        if snapshot is None:
             return
 
-        response = response.json()
-
-        self.city['geo'] = response['name']
-        self.coordinates = f"Longitude: {response['coord']['lon']}, Latitude: {response['coord']['lat']}"
-        self.condition = response['weather'][0]['description']
-        self.weather = {
-            'temp': (response['main']['temp'] - 273.15) * 1.8 + 32,
-            'feel like': (response['main']['feels_like'] - 273.15) * 1.8 + 32,
-            'Low': (response['main']['temp_min'] - 273.15) * 1.8 + 32,
-            'High': (response['main']['temp_max'] - 273.15) * 1.8 + 32,
-            'humidity': response['main']['humidity'],
-            'icon': response['weather'][0]['icon']
-        }
-        
-        self.icon_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'icons', f'{self.weather["icon"]}.png')
+        self.city_name = city_name
+        self.process_weather(snapshot)
+        self.display_weather()
+        STARTUP.mark("cached_shown")
 
-        self.icon_pixmap =QPixmap(self.icon_path)
+    def set_loading(self, loading: bool, query: str = None) -> None:
+        '''
+        Show or clear the loading state while a fetch is in flight.
+        :param loading: True while waiting for a response.
+        :param query: The city being fetched.
+        :return: None
+        '''
+        self.loading = loading
+        if loading:
+            self.statusbar.showMessage(f"Loading weather for {query or self.city_name}...")
+            if not self.model.rowCount():
+                self.model.set_rows(["Loading..."])
+        else:
+            self.statusbar.clearMessage()
+
+    def on_weather_fetched(self, snapshot: WeatherSnapshot, generation: int, background: bool = False,
+                           query: str = None) -> None:
+        '''
+        Receive a finished fetch on the GUI thread and display it.
+        :param snapshot: The parsed observation.
+        :param generation: The fetch counter value the request was started with.
+        :param background: True for scheduled refreshes.
+        :param query: The query the request was made with; it becomes the displayed city.
+        :return: None
+        '''
+        if generation != self.fetch_generation:
+            return  # A newer request superseded this one
+        if query is not None:
+            self.city_name = query
+
+        self.refresh_failures = 0
+        unchanged = (self.snapshot is not None and snapshot.city_id == self.snapshot.city_id
+                     and snapshot.observed_at == self.snapshot.observed_at)
+        if background and unchanged:
+            self.unchanged_polls += 1
+            self.snapshot = convert_snapshot(snapshot, self.units)  # Same observation, nothing to repaint
+        else:
+            self.unchanged_polls = 0
+            if not background:
+                self.set_loading(False)
+            self.process_weather(snapshot)
+            self.display_weather()
+            observe_stage("fetch_to_display", time.perf_counter() - self.fetch_started, background=background)
+            STARTUP.mark("weather_shown")
+        self.schedule_refresh()
+
+        forecast = self.forecast
+        if forecast is None or forecast.query != self.city_name or forecast.is_stale():
+            self.get_forecast(background)
+
+    def on_weather_failed(self, message: str, generation: int, background: bool = False) -> None:
+        '''
+        Report a failed fetch in the status bar and keep the last good display.
+        Retries back off; a failed search while a city is shown does not
+        retry at all, the shown city keeps its normal refresh schedule.
+        :param message: Description of the failure.
+        :param generation: The fetch counter value the request was started with.
+        :param background: True for scheduled refreshes.
+        :return: None
+        '''
+        if generation != self.fetch_generation:
+            return
 
-        self.wind = response['wind']['speed']
+        STARTUP.mark("fetch_failed")
+        if background or self.snapshot is None:
+            self.refresh_failures += 1
+            self.refresh_timer.start(int(self.refresh_policy.retry_delay(self.refresh_failures) * 1000))
+        else:
+            self.schedule_refresh()
+        if background:
+            return
 
-        local_timezone = dt.timezone(dt.timedelta(seconds=response['timezone']))
-        current_utc_time = dt.datetime.now(dt.timezone.utc)
-        self.current_local_time = current_utc_time.astimezone(local_timezone)
+        self.set_loading(False)
+        self.statusbar.showMessage(message, 10000)
+        if self.snapshot is None:  # Nothing displayed yet, replace the placeholder
+            self.model.set_rows([message])
 
-        self.sunrise = dt.datetime.fromtimestamp(response['sys']['sunrise'], tz=local_timezone)
-        self.sunset = dt.datetime.fromtimestamp(response['sys']['sunset'], tz=local_timezone)
-        self.display_weather()
+    def get_forecast(self, background: bool = False) -> None:
+        '''
+        Fetch the 5 day forecast for the displayed city on a worker thread.
+        :param background: True when started by a scheduled refresh.
+        :return: None
+        '''
+        self.forecast_generation += 1
+        generation = self.forecast_generation
+        city_name = self.city_name
+
+        worker = Worker(self.client.forecast, city_name, BACKGROUND if background else INTERACTIVE, background)
+        worker.signals.finished.connect(lambda forecast: self.on_forecast_fetched(forecast, generation))
+        worker.signals.error.connect(lambda message: self.on_forecast_failed(message, city_name, generation))
+        self.threadpool.start(worker)
+
+    def on_forecast_fetched(self, forecast, generation: int) -> None:
+        '''
+        Show a finished forecast next to the current conditions.
+        :param forecast: weather.forecast.Forecast
+        :param generation: The forecast counter value the request was started with.
+        :return: None
+        '''
+        if generation != self.forecast_generation:
+            return
+        self.forecast = forecast
+        self.forecast_model.set_rows(forecast.summary_lines(self.units))
+
+    def on_forecast_failed(self, message: str, city_name: str, generation: int) -> None:
+        '''
+        Keep a forecast already shown for the same city, otherwise show the error.
+        :param message: Description of the failure.
+        :param city_name: City the request was for.
+        :param generation: The forecast counter value the request was started with.
+        :return: None
+        '''
+        if generation != self.forecast_generation:
+            return
+        if self.forecast is None or self.forecast.query != city_name:
+            self.forecast = None
+            self.forecast_model.set_rows([f"Forecast unavailable: {message}"])
+
+    def process_weather(self, snapshot: WeatherSnapshot) -> None:
+        '''
+        Make a snapshot the current observation.
+        :param snapshot: The parsed observation.
+        :return: None
+        '''
+        self.snapshot = convert_snapshot(snapshot, self.units)  # No-op unless the units changed in flight
+        self.city['geo'] = snapshot.name
+
+    def show_icon(self) -> None:
+        '''
+        Put the current condition icon, pre-scaled for the label, on the label.
+        :param: None
+        :return: None
+        '''
+        if self.snapshot is not None:
+            self.label_icon.setPixmap(
+                self.icons.pixmap(self.snapshot.icon, self.label_icon.size(), self.label_icon.devicePixelRatioF()))
+
+    def eventFilter(self, obj, event) -> bool:
+        '''
+        Rescale the icon when its label changes size.
+        '''
+        if obj is self.label_icon and event.type() == QEvent.Resize:
+            self.icons.invalidate()
+            self.show_icon()
+        return super().eventFilter(obj, event)
+
+    def on_screen_changed(self, screen) -> None:
+        '''
+        Moving to a screen with another device pixel ratio needs new scaled icons.
+        :param screen: The new QScreen.
+        :return: None
+        '''
+        self.icons.invalidate()
+        self.show_icon()
+        self.icons.preload(self.label_icon.size(), self.label_icon.devicePixelRatioF())
 
     def format_time(self, time) -> str:
         '''
@@ -304,8 +932,8 @@ class Controller(QMainWindow, Ui_MainWindow):
         :param: None
         :return: None
         '''
-        self.current_local_time = self.current_local_time + dt.timedelta(seconds=1)
-        self.time_label.setText(self.format_time(self.current_local_time))
+        if self.snapshot is not None:
+            self.time_label.setText(self.format_time(self.snapshot.local_time()))
     
 
     def display_weather(self) -> None:
@@ -314,30 +942,29 @@ class Controller(QMainWindow, Ui_MainWindow):
         :param: None
         :return: None
         '''
-        self.lineEdit.setText(self.city_name)
-
-        self.model.clear() 
-
-        weather_details = [
-            f"City: {self.city['geo']}",
-            f"Condition: {self.condition.upper()}",
-            f"Temperature: {int(self.weather['temp'])} F",
-            f"Feels like: {int(self.weather['feel like'])} F",
-            f"Low: {int(self.weather['Low'])} F, High: {int(self.weather['High'])} F",
-            f"Humidity: {self.weather['humidity']}%",
-            f"Wind: {self.wind} MPH",
-            f"Sunrise: {self.format_time(self.sunrise)}",
-            f"Sunset: {self.format_time(self.sunset)}",
-            f"Coordinates: {self.coordinates}"
-        ]
-        
-        for detail in weather_details:
-            self.model.appendRow(QStandardItem(detail))
-        
-        self.label_icon.setPixmap(self.icon_pixmap)
-        self.label_icon.setScaledContents(True)
-
-        self.listView.setSelectionMode(QListView.NoSelection)
-        self.lineEdit.setEnabled(False)
-
-        self.update_current_time()
\ No newline at end of file
+        with stage("display_weather"):
+            self.lineEdit.setText(self.city_name)
+
+            snapshot = self.snapshot
+            weather_details = [
+                f"City: {snapshot.name}",
+                f"Condition: {snapshot.condition.upper()}",
+                f"Temperature: {format_temperature(snapshot.temp, snapshot.units)}",
+                f"Feels like: {format_temperature(snapshot.feels_like, snapshot.units)}",
+                f"Low: {format_temperature(snapshot.temp_min, snapshot.units)}, "
+                f"High: {format_temperature(snapshot.temp_max, snapshot.units)}",
+                f"Humidity: {snapshot.humidity}%",
+                f"Wind: {format_speed(snapshot.wind_speed, snapshot.units)}",
+                f"Sunrise: {self.format_time(snapshot.local_time(snapshot.sunrise))}",
+                f"Sunset: {self.format_time(snapshot.local_time(snapshot.sunset))}",
+                f"Coordinates: Longitude: {snapshot.lon}, Latitude: {snapshot.lat}"
+            ]
+            self.model.set_rows(weather_details)
+
+            self.show_icon()
+
+            self.listView.setSelectionMode(QListView.NoSelection)
+            self.lineEdit.setEnabled(False)
+            self.showing_weather = True
+
+            self.update_current_time()
\ No newline at end of file
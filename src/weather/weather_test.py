@@ -19,6 +19,12 @@ class Controller(QMainWindow, Ui_MainWindow):
         super().__init__()
         self.setupUi(self)
 
+        # Add corner widget (time label) to the top-right corner of the menu bar
+        self.time_label = QLabel("Loading...")
+        self.time_label.setAlignment(Qt.AlignCenter)
+        self.time_label.setFixedWidth(120)
+        self.menubar.setCornerWidget(self.time_label, Qt.TopRightCorner)
+
         self.city = {'default': 'Judsonia', 'geo': None}
         self.word_list = []
         self.allow_suggestions = False  # Control suggestions
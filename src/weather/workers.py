@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal, pyqtSlot
+
+
+class WorkerSignals(QObject):
+    '''
+    Signals used by a Worker to hand its outcome back to the GUI thread.
+    finished carries the callable's return value, error carries a message.
+    '''
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+
+class Worker(QRunnable):
+    '''
+    Run a callable on a QThreadPool thread.
+
+    The callable must not touch any widget; its result is delivered through
+    self.signals, which are queued onto the thread that connected to them.
+    '''
+    def __init__(self, fn, *args, **kwargs) -> None:
+        '''
+        :param fn: Callable to run off the GUI thread.
+        :param args: Positional arguments for fn.
+        :param kwargs: Keyword arguments for fn.
+        :return: None
+        '''
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+
+    @pyqtSlot()
+    def run(self) -> None:
+        '''
+        Call fn and emit finished with its result, or error with the exception text.
+        :param: None
+        :return: None
+        '''
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as exc:
+            self.signals.error.emit(str(exc) or exc.__class__.__name__)
+        else:
+            self.signals.finished.emit(result)